@@ -1,7 +1,217 @@
+import logging, numpy
+from abc import ABCMeta, abstractmethod
+
+logger = logging.getLogger('bandit_test')
+
+def rollout(task):
+    """
+    Pull an arm several times. This is a module level function so it can
+    be dispatched through a process pool.
+
+    @param task A tuple (arm, n, keep_outcomes)
+    @return A tuple (successes, outcomes), outcomes is None unless keep_outcomes
+    """
+    arm, n, keep_outcomes = task
+    if not keep_outcomes and hasattr(arm, 'generate_successes'):
+        return arm.generate_successes(n), None
+    results = arm.generate(n)
+    return sum(results), results if keep_outcomes else None
 
 class BanditAlgorithm(object):
+    __metaclass__ = ABCMeta
 
-    def __init__(self, arm_set, budget, data_logger=None):
+    def __init__(self, arm_set, budget, data_logger=None, record_outcomes=False):
+        """
+        @param arm_set A dictionary mapping arm id to an arm with a generate(n)
+          method. If the arm set has a generate_successes(indices, n) method,
+          as BinomialArmSet does, arms are pulled together in a single draw.
+        @param budget The total number of pulls
+        @param data_logger A DataLogger to record progress to
+        @param record_outcomes If true, keep every outcome of every arm in
+          self.outcomes for debugging
+        """
         self.arm_set = arm_set
         self.budget = budget
         self.data_logger = data_logger
+        self.record_outcomes = record_outcomes
+
+    def reset(self):
+        """
+        Clear the statistics of every arm and restart the algorithm
+        """
+        self._reset()
+        self._start()
+
+    def _reset(self):
+        """
+        Clear the statistics of every arm. Arms are Bernoulli, so the number
+        of pulls and successes of an arm are sufficient statistics.
+        """
+        arms = self.arm_set.keys()
+        self.arms = arms if isinstance(arms, numpy.ndarray) else list(arms)
+        self.pulls = numpy.zeros(len(self.arms), dtype=numpy.int64)
+        self.successes = numpy.zeros(len(self.arms), dtype=numpy.int64)
+        self.num_pulls = 0
+        self.outcomes = {arm: [] for arm in self.arms} if self.record_outcomes else None
+
+    def _start(self):
+        """
+        Initialize any algorithm specific state
+        """
+        pass
+
+    @abstractmethod
+    def _advance(self, max_pulls):
+        """
+        Perform the next unit of work of the algorithm (a pull, a round or a
+        phase). Should use max_pulls pulls or fewer when the algorithm allows it.
+        """
+        return
+
+    def done(self):
+        """
+        @return True if the algorithm has finished
+        """
+        return self.num_pulls >= self.budget
+
+    def recommend(self):
+        """
+        @return The arm the algorithm would select if it stopped now
+        """
+        return self.arms[self._recommend_index()]
+
+    def _recommend_index(self):
+        """
+        @return The index of the arm with the highest X_hat
+        """
+        return numpy.argmax(self._means())
+
+    def confidence(self):
+        """
+        A Hoeffding bound on the probability that the recommended arm is the
+        best arm. One minus the sum over every other arm j of
+        exp(-2 gap_j^2 / (1/s_best + 1/s_j)), where gap_j is the difference in
+        empirical means and s the number of pulls.
+        @return The confidence in recommend(), 0 if some arm has not been pulled
+        """
+        if numpy.any(self.pulls == 0):
+            return 0.
+        X_hat = self._means()
+        best = self._recommend_index()
+        gaps = X_hat[best] - X_hat
+        if numpy.any(numpy.delete(gaps, best) <= 0.):
+            return 0.
+        inv = 1. / self.pulls
+        errors = numpy.exp(-2. * gaps**2 / (inv[best] + inv))
+        errors[best] = 0.
+        return max(0., 1. - numpy.sum(errors))
+
+    def step(self, n_pulls):
+        """
+        Perform at least n_pulls more pulls, or fewer if the algorithm
+        finishes first. Algorithms that work in rounds or phases finish the
+        current one, so the pulls performed may exceed n_pulls.
+        @return A tuple (recommended arm, confidence)
+        """
+        if not hasattr(self, 'pulls'):
+            self.reset()
+        target = self.num_pulls + n_pulls
+        while self.num_pulls < target and not self.done():
+            self._advance(target - self.num_pulls)
+        return self.recommend(), self.confidence()
+
+    def iterate(self, batch_size=1, confidence=None):
+        """
+        Run the algorithm in batches of pulls
+        @param batch_size The number of pulls between updates
+        @param confidence If not None, stop once the confidence in the
+          recommended arm reaches this threshold
+        @return A generator of (num_pulls, recommended arm, confidence) tuples
+        """
+        if not hasattr(self, 'pulls'):
+            self.reset()
+        while not self.done():
+            arm, c = self.step(batch_size)
+            yield self.num_pulls, arm, c
+            if confidence is not None and c >= confidence:
+                break
+
+    def solve(self, confidence=None, batch_size=None):
+        """
+        Run the algorithm from scratch until it finishes, or until the
+        confidence in the recommended arm reaches confidence
+        @param batch_size The number of pulls between confidence checks,
+          defaults to one unit of work (a pull, a round or a phase)
+        @return The selected arm
+        """
+        logger.info('Running %s', self.name)
+
+        self.reset()
+        if confidence is None:
+            self.step(self.budget)
+        else:
+            for _ in self.iterate(batch_size or 1, confidence=confidence):
+                pass
+        return self.recommend()
+
+    def _pull(self, idx, n):
+        """
+        Pull the arm self.arms[idx] n times and update its statistics
+        @return The number of successes
+        """
+        task = (self.arm_set[self.arms[idx]], n, self.outcomes is not None)
+        return self._record(idx, n, rollout(task))
+
+    def _pull_many(self, indices, n):
+        """
+        Pull every arm in indices n times and update their statistics
+        @param indices An array of arm indices
+        """
+        if n == 0 or len(indices) == 0:
+            return
+        if self.outcomes is not None or not hasattr(self.arm_set, 'generate_successes'):
+            for idx in indices:
+                self._pull(idx, n)
+            return
+
+        s = self.arm_set.generate_successes(self.arms[indices], n)
+        self.pulls[indices] += n
+        self.successes[indices] += s
+        self.num_pulls += n * len(indices)
+        if self.data_logger:
+            self.data_logger.log_many(self.name, self.arms[indices], n, s)
+
+    def _pull_all(self, indices, n, executor):
+        """
+        Pull every arm in indices n times, dispatching the pulls together
+        through executor, and update their statistics once all are done
+        @param executor An object with a map(func, iterable) method
+        """
+        keep_outcomes = self.outcomes is not None
+        tasks = [(self.arm_set[self.arms[idx]], n, keep_outcomes) for idx in indices]
+        for idx, result in zip(indices, executor.map(rollout, tasks)):
+            self._record(idx, n, result)
+
+    def _record(self, idx, n, result):
+        """
+        @param result The (successes, outcomes) of n pulls of self.arms[idx]
+        @return The number of successes
+        """
+        s, results = result
+        if self.outcomes is not None:
+            self.outcomes[self.arms[idx]] += results
+        self.pulls[idx] += n
+        self.successes[idx] += s
+        self.num_pulls += n
+        if self.data_logger:
+            self.data_logger.log(self.name, self.arms[idx], n, s)
+        return s
+
+    def _means(self):
+        """
+        @return The empirical mean of every arm, 0 for arms that have not been pulled
+        """
+        X_hat = numpy.zeros(len(self.arms))
+        pulled = self.pulls > 0
+        X_hat[pulled] = self.successes[pulled] / self.pulls[pulled].astype(float)
+        return X_hat
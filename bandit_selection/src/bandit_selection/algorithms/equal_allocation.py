@@ -1,38 +1,28 @@
-import copy, logging, numpy
+import logging, numpy
 from bandit import BanditAlgorithm
 
 logger = logging.getLogger('bandit_test')
 
 class EqualAllocation(BanditAlgorithm):
 
-    def __init__(self, arm_set, budget, data_logger = None):
-        BanditAlgorithm.__init__(self, arm_set, budget, data_logger=data_logger)
+    def __init__(self, arm_set, budget, data_logger = None, record_outcomes = False):
+        BanditAlgorithm.__init__(self, arm_set, budget, data_logger=data_logger,
+                                 record_outcomes=record_outcomes)
         self.name = 'Equal Allocation'
 
-    def solve(self):
-        
-        logger.info('Running EqualAllocation')
-
-        A = self.arm_set.keys()
-        
-        num_rounds = int(numpy.floor(self.budget / float(len(A))))
-        
-        all_results = {arm: [] for arm in A}
-        for r in xrange(num_rounds):
-            for arm in A:
-                all_results[arm] += self.arm_set[arm].generate(1)
-
-            # Log
-            if self.data_logger:
-                self.data_logger.log(self.name, copy.deepcopy(all_results))
-
-        # Compute X_hat for every arm
-        X_hat = {}
-        for arm in A:
-            if len(all_results[arm]) == 0:
-                X_hat[arm] = 0.
-            else:
-                X_hat[arm] = numpy.mean(all_results[arm])
-        selected_arm = max(X_hat.keys(), key = lambda x: X_hat[x])
-
-        return selected_arm
+    def _start(self):
+        self.num_rounds = int(numpy.floor(self.budget / float(len(self.arms))))
+        self.round = 0
+
+    def done(self):
+        return self.round >= self.num_rounds
+
+    def _advance(self, max_pulls):
+        K = len(self.arms)
+        if self.data_logger:
+            # Pull one round at a time so progress can be logged
+            num_rounds = 1
+        else:
+            num_rounds = min(max(1, max_pulls // K), self.num_rounds - self.round)
+        self._pull_many(numpy.arange(K), num_rounds)
+        self.round += num_rounds
@@ -0,0 +1,78 @@
+import logging, numpy
+from bandit import BanditAlgorithm
+
+logger = logging.getLogger('bandit_test')
+
+class LUCB(BanditAlgorithm):
+
+    def __init__(self, arm_set, budget, delta=0.05, epsilon=0.,
+                 data_logger=None, record_outcomes=False):
+        """
+        LUCB1 (Kalyanakrishnan et al. 2012). Every round pulls the arm with the
+        highest empirical mean and the arm with the highest upper confidence
+        bound among the others, and stops once the lower bound of the first
+        is within epsilon of the upper bound of the second.
+
+        @param delta The allowed probability of selecting a wrong arm
+        @param epsilon The allowed gap between the selected arm and the best arm
+        @param budget A cap on the total number of pulls
+        """
+        BanditAlgorithm.__init__(self, arm_set, budget, data_logger=data_logger,
+                                 record_outcomes=record_outcomes)
+        self.delta = delta
+        self.epsilon = epsilon
+        self.name = 'LUCB'
+
+    def _start(self):
+        self.t = 0
+        self.stopped = False
+
+    def done(self):
+        return self.stopped or self.num_pulls >= self.budget
+
+    def _beta(self, u):
+        """
+        @param u The number of pulls of every arm
+        @return The width of the confidence interval of every arm
+        """
+        K = len(self.arms)
+        t = max(self.t, 1)
+        return numpy.sqrt(numpy.log(1.25 * K * t**4 / self.delta) / (2. * u))
+
+    def _advance(self, max_pulls):
+        K = len(self.arms)
+        if self.t == 0:
+            # Pull every arm once
+            for idx in xrange(K):
+                self._pull(idx, 1)
+            self.t = 1
+        else:
+            h, l = self._bounds()
+            self._pull(h, 1)
+            self._pull(l, 1)
+            self.t += 1
+
+        if K < 2:
+            self.stopped = True
+            return
+        h, l = self._bounds()
+        beta = self._beta(self.pulls)
+        X_hat = self._means()
+        if X_hat[l] + beta[l] < X_hat[h] - beta[h] + self.epsilon:
+            self.stopped = True
+
+    def _bounds(self):
+        """
+        @return The index of the arm with the highest X_hat and the index of
+          the arm with the highest upper bound among the rest
+        """
+        X_hat = self._means()
+        h = numpy.argmax(X_hat)
+        ucb = X_hat + self._beta(self.pulls)
+        ucb[h] = -numpy.inf
+        return h, numpy.argmax(ucb)
+
+    def confidence(self):
+        if self.stopped:
+            return 1. - self.delta
+        return BanditAlgorithm.confidence(self)
@@ -1,52 +1,108 @@
-import copy, logging, math, numpy, random
+import logging, math, numpy, random
 from bandit import BanditAlgorithm
 
 logger = logging.getLogger('bandit_test')
 
 class SuccessiveRejects(BanditAlgorithm):
 
-    def __init__(self, arm_set, budget, data_logger = None):
-        BanditAlgorithm.__init__(self, arm_set, budget, data_logger = data_logger)
+    def __init__(self, arm_set, budget, data_logger = None, record_outcomes = False,
+                 executor = None):
+        """
+        @param executor An object with a map(func, iterable) method used to
+          run all the rollouts of a phase together, for example a thread or
+          process pool from utils.executor. Defaults to running them serially.
+        """
+        BanditAlgorithm.__init__(self, arm_set, budget, data_logger = data_logger,
+                                 record_outcomes = record_outcomes)
         self.name = 'Successive Rejects'
+        self.executor = executor
 
-    def solve(self):
-        logger.info('Running SuccessiveRejects')
+    def _start(self):
+        K = len(self.arms)
 
-        results = []
-        
-        K = len(self.arm_set)
-        A = self.arm_set.keys()
+        # Arms that have not been rejected yet are self.A[:self.num_active],
+        # a rejected arm is swapped with the last active one
+        self.A = numpy.arange(K)
+        self.num_active = K
+        self.phase = 1
 
+        # The number of pulls of every surviving arm after each phase
+        self.n_k = self._phase_sizes(self.budget, K)
+
+    def done(self):
+        return self.num_active <= 1
+
+    def _recommend_index(self):
+        active = self.A[:self.num_active]
+        return active[numpy.argmax(self._active_means(active))]
+
+    def _active_means(self, active):
+        """
+        @return X_hat of the arms in active, 0 for arms that have not been pulled
+        """
+        return self.successes[active] / numpy.maximum(self.pulls[active], 1).astype(float)
+
+    def _advance(self, max_pulls):
+        """
+        Run a single phase, or every consecutive phase without any pulls
+        """
         # There are K trajectories. The successive rejects algorithm rejects
         # exactly one trajectory in each phase, so there are K - 1 phases.
-        all_results = { arm: [] for arm in A}
-        for k in xrange(1, K):
-            num_rounds = self._n(self.budget, k, K) - self._n(self.budget, k - 1, K)
-
-            # Execute all rollouts in this phase
-            for arm in A:
-                rollout_results = self.arm_set[arm].generate(num_rounds)
-                all_results[arm] += rollout_results
-
-            # Log
-            if self.data_logger:
-                self.data_logger.log(self.name, copy.deepcopy(all_results))
-
-            # Recompute X_hat for all arms
-            X_hat = { arm: numpy.mean(all_results[arm]) for arm in A }
-
-            # Find the worst trajectory. Randomize in the case of a tie.
-            worst_X_hat = min(X_hat[arm] for arm in A)
-            worst_candidates = [ arm for arm in A
-                                 if abs(X_hat[arm] - worst_X_hat) < 0.0001 ]
-            worst_arm = random.choice(worst_candidates)
-            A.remove(worst_arm)
-
-        assert len(A) == 1
-        best_arm = A.pop()
-        return best_arm
-
-    
+        K = len(self.arms)
+        k = self.phase
+        active = self.A[:self.num_active]
+        num_rounds = self.n_k[k] - self.n_k[k - 1]
+
+        if num_rounds == 0:
+            # X_hat does not change until the next phase with pulls, so
+            # all the phases up to it reject the worst arms in order
+            last = numpy.searchsorted(self.n_k, self.n_k[k - 1], side='right') - 1
+            num_phases = min(last, K - 1) - k + 1
+            if num_phases > 1:
+                self._reject_worst(active, num_phases)
+                self.phase += num_phases
+                return
+
+        # Execute all rollouts in this phase
+        if self.executor is None:
+            self._pull_many(active, num_rounds)
+        elif num_rounds > 0:
+            self._pull_all(active, num_rounds, self.executor)
+
+        # Recompute X_hat for the active arms
+        X_hat = self._active_means(active)
+
+        # Find the worst trajectory. Randomize in the case of a tie.
+        worst_candidates = numpy.flatnonzero(numpy.abs(X_hat - X_hat.min()) < 0.0001)
+        pos = random.choice(worst_candidates)
+        self.A[pos], self.A[self.num_active - 1] = self.A[self.num_active - 1], self.A[pos]
+        self.num_active -= 1
+        self.phase += 1
+
+    def _reject_worst(self, active, num_rejects):
+        """
+        Reject the num_rejects arms with the lowest X_hat, breaking exact
+        ties randomly
+        """
+        X_hat = self._active_means(active)
+        order = numpy.lexsort((numpy.random.random_sample(len(active)), X_hat))
+        keep = numpy.ones(len(active), dtype=bool)
+        keep[order[:num_rejects]] = False
+        self.num_active -= num_rejects
+        self.A[:self.num_active] = active[keep]
+
+    @classmethod
+    def _phase_sizes(cls, n, K):
+        """
+        @param n Total budget of tests
+        @param K The total number of arms
+        @return An array holding _n(n, k, K) for every phase k from 0 to K - 1
+        """
+        k = numpy.arange(1, K)
+        n_k = numpy.zeros(K, dtype=numpy.int64)
+        n_k[1:] = numpy.ceil((1. / cls._log_bar(K)) * (n - K) / (K + 1. - k))
+        return n_k
+
     @classmethod
     def _n(cls, n, k, K):
         '''
@@ -63,4 +119,4 @@ class SuccessiveRejects(BanditAlgorithm):
                 
     @staticmethod
     def _log_bar(k):
-        return 0.5 + sum(1. / i for i in xrange(2, k + 1))
+        return 0.5 + numpy.sum(1. / numpy.arange(2, k + 1))
@@ -0,0 +1,120 @@
+"""
+Vectorized Monte-Carlo versions of the bandit algorithms.
+
+Each function runs num_trials independent trials of an algorithm at once on
+Bernoulli arms with success probabilities pvals. Per-trial pull counts and
+success counts are kept in (trials x arms) arrays, so a trial costs a few
+numpy operations per phase (or per pull for UCB-E) rather than a Python
+loop per pull. Trials are processed in chunks so memory stays bounded.
+"""
+import logging, numpy
+from successive_rejects import SuccessiveRejects
+
+logger = logging.getLogger('bandit_test')
+
+def _chunked(solve, num_trials, num_arms, max_elements):
+    """
+    Run solve(n) over chunks of trials holding at most max_elements
+    (trial, arm) entries and concatenate the selected arms
+    """
+    chunk_size = max(1, int(max_elements // num_arms))
+    selected = []
+    for start in xrange(0, num_trials, chunk_size):
+        selected.append(solve(min(chunk_size, num_trials - start)))
+    return numpy.concatenate(selected)
+
+def equal_allocation_trials(pvals, budget, num_trials, max_elements=10**7):
+    """
+    @param pvals The success probability of every arm
+    @param budget The total number of pulls per trial
+    @param num_trials The number of independent trials
+    @return The index of the arm selected in each trial
+    """
+    pvals = numpy.asarray(pvals, dtype=float)
+    num_rounds = int(numpy.floor(budget / float(len(pvals))))
+
+    def solve(T):
+        successes = numpy.random.binomial(num_rounds, pvals, size=(T, len(pvals)))
+        return numpy.argmax(successes, axis=1)
+
+    return _chunked(solve, num_trials, len(pvals), max_elements)
+
+def successive_rejects_trials(pvals, budget, num_trials, max_elements=10**7):
+    """
+    @param pvals The success probability of every arm
+    @param budget The total number of pulls per trial
+    @param num_trials The number of independent trials
+    @return The index of the arm selected in each trial
+    """
+    pvals = numpy.asarray(pvals, dtype=float)
+    K = len(pvals)
+
+    # Every surviving arm has the same number of pulls n_k after phase k
+    log_bar = SuccessiveRejects._log_bar(K)
+    n_k = [0] + [int(numpy.ceil((1. / log_bar) * (budget - K) / (K + 1. - k)))
+                 for k in xrange(1, K)]
+
+    def solve(T):
+        rows = numpy.arange(T)
+        active = numpy.ones((T, K), dtype=bool)
+        successes = numpy.zeros((T, K))
+        for k in xrange(1, K):
+            num_rounds = n_k[k] - n_k[k-1]
+            if num_rounds > 0:
+                successes += numpy.random.binomial(num_rounds, pvals, size=(T, K))
+
+            if n_k[k] > 0:
+                X_hat = successes / n_k[k]
+            else:
+                X_hat = numpy.zeros((T, K))
+            X_hat[~active] = numpy.inf
+
+            # Find the worst arm in each trial. Randomize in the case of a tie.
+            worst_X_hat = X_hat.min(axis=1)
+            candidates = active & (numpy.abs(X_hat - worst_X_hat[:, None]) < 0.0001)
+            keys = numpy.random.random_sample((T, K))
+            keys[~candidates] = -1.
+            active[rows, numpy.argmax(keys, axis=1)] = False
+
+        return numpy.argmax(active, axis=1)
+
+    return _chunked(solve, num_trials, K, max_elements)
+
+def ucb_e_trials(pvals, budget, a, num_trials, max_elements=10**7):
+    """
+    @param pvals The success probability of every arm
+    @param budget The total number of pulls per trial
+    @param a The exploration parameter of UCB-E
+    @param num_trials The number of independent trials
+    @return The index of the arm selected in each trial
+    """
+    pvals = numpy.asarray(pvals, dtype=float)
+    K = len(pvals)
+
+    def solve(T):
+        rows = numpy.arange(T)
+        counts = numpy.zeros((T, K))
+        successes = numpy.zeros((T, K))
+        B = numpy.full((T, K), numpy.inf)
+        for i in xrange(budget):
+            selected = numpy.argmax(B, axis=1)
+            outcomes = numpy.random.random_sample(T) < pvals[selected]
+            counts[rows, selected] += 1
+            successes[rows, selected] += outcomes
+            s = counts[rows, selected]
+            B[rows, selected] = successes[rows, selected] / s + numpy.sqrt(a / s)
+
+        X_hat = numpy.zeros((T, K))
+        pulled = counts > 0
+        X_hat[pulled] = successes[pulled] / counts[pulled]
+        return numpy.argmax(X_hat, axis=1)
+
+    return _chunked(solve, num_trials, K, max_elements)
+
+def selection_distribution(selected, num_arms):
+    """
+    @param selected The arm selected in each trial
+    @param num_arms The number of arms
+    @return The fraction of trials that selected each arm
+    """
+    return numpy.bincount(selected, minlength=num_arms) / float(len(selected))
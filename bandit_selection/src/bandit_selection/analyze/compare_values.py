@@ -1,31 +1,57 @@
 #!/usr/bin/env python
 import argparse, math, numpy
-from ss_plotting import make_plots
 from compute_expected_value import compute_expected_value
 
-def compute_actuals(arms, num_trials, max_selected_arms = 1):
+def _actuals_chunk(task):
+    """
+    Sum the running maximum of the values of random permutations of the arms
+    @param task A tuple (arms, num_trials, max_selected_arms, seed)
+    @return The sum over num_trials permutations of the best of the first
+      k arms, for every k from 1 to max_selected_arms
+    """
+    arms, num_trials, max_selected_arms, seed = task
+    rng = numpy.random.RandomState(seed)
+
+    # Each row of random keys sorts into an independent permutation
+    perms = numpy.argsort(rng.random_sample((num_trials, len(arms))), axis=1)
+    selected = arms[perms[:, :max_selected_arms]]
+    return numpy.maximum.accumulate(selected, axis=1).sum(axis=0)
+
+def compute_actuals(arms, num_trials, max_selected_arms = 1, processes = None,
+                    max_elements = 10**7):
+    """
+    Estimate the value of the best of k randomly selected arms for every k
+    up to max_selected_arms. Every trial draws one random permutation of
+    the arms and the best of k is the running maximum of its first k arms.
+
+    @param num_trials The number of permutations to average over
+    @param processes If greater than 1, split the trials across this many processes
+    @param max_elements The largest number of (trial, arm) entries held
+      in memory at once by a process
+    @return The average value for every k from 1 to max_selected_arms
+    """
+    arms = numpy.asarray(arms, dtype=float)
     num_arms = len(arms)
 
-    actual_values = numpy.zeros(max_selected_arms)
-    for num_selected in range(max_selected_arms):
+    chunk_size = max(1, max_elements // num_arms)
+    tasks = [(arms, min(chunk_size, num_trials - start), max_selected_arms,
+              numpy.random.randint(2**31 - 1))
+             for start in xrange(0, num_trials, chunk_size)]
 
-        total_value = 0
-        for trial in range(num_trials):
-            # Compute random permultation of trajectory list
-            sorted_arms = numpy.random.permutation(arms)
-            
-            # Selected the first k
-            selected_arms = sorted_arms[:num_selected+1]
+    if processes is not None and processes > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(processes)
+        sums = pool.map(_actuals_chunk, tasks)
+        pool.close()
+        pool.join()
+    else:
+        sums = map(_actuals_chunk, tasks)
 
-            # Compute the value as the max
-            total_value += max(selected_arms)
-
-        actual_values[num_selected] = total_value / num_trials
-
-    return actual_values
+    return numpy.sum(sums, axis=0) / float(num_trials)
 
 
 if __name__ == '__main__':
+    from ss_plotting import make_plots
 
     parser = argparse.ArgumentParser(description="Run a trial")
 
@@ -38,6 +64,8 @@ if __name__ == '__main__':
     parser.add_argument("--arm-dists", choices=["uniform", "skew-high", "skew-low"],
                         nargs='+', default = ['uniform'], 
                         help="The type of underlying distribution")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="The number of processes used to compute the actual value")
     parser.add_argument("--save-plots", action="store_true",
                         help="Save the plots generated by the script")
     args = parser.parse_args()
@@ -72,7 +100,8 @@ if __name__ == '__main__':
         
         # Now compute the actual value 
         actual_vals = compute_actuals(arms, args.num_trials, 
-                                      max_selected_arms = max_selected_arms)
+                                      max_selected_arms = max_selected_arms,
+                                      processes = args.processes)
         
         bin_size = 0.1
         hist_data, bin_edges = numpy.histogram(arms, bins=numpy.arange(0.0, 1.05, bin_size))
@@ -1,8 +1,6 @@
 #!/usr/bin/env python
 import argparse, math, numpy
 import scipy.special
-from ss_plotting import make_plots
-from scipy.stats import norm
 
 distributions = {'gauss-left': [0.3, 0.3],
                  'gauss-right': [0.7, 0.1]}
@@ -24,24 +22,67 @@ def draw_arms(dist, num_arms):
         arms = arms[:num_arms]
     return arms
 
-def compute_expected_value(arms, max_selected_arms = None):
+def compute_expected_value(arms, max_selected_arms = None, tol = 1e-12, max_elements = 10**7):
+    """
+    Compute the expected value of the best of m arms drawn without
+    replacement, for every m up to max_selected_arms. With the arms sorted,
+    the best of m is the a-th arm with probability C(a, m-1) / C(K, m). The
+    probabilities are computed in log space with gammaln, so they do not
+    overflow for large K.
+
+    @param arms The value of every arm
+    @param max_selected_arms The largest number of selected arms to consider,
+      defaults to all of them, at most the number of arms
+    @param tol Arms whose total probability of being the best of m is below
+      tol are skipped when computing the value for m
+    @param max_elements The largest number of (arm, m) probabilities held
+      in memory at once
+    @return The expected value for every m from 1 to max_selected_arms
+    """
     arms = numpy.sort(arms)
     num_arms = len(arms)
 
     if max_selected_arms is None:
         max_selected_arms = num_arms
+    if max_selected_arms > num_arms:
+        raise ValueError('Cannot select %d of %d arms' % (max_selected_arms, num_arms))
+
+    # log(n!) for every n up to num_arms
+    log_fact = scipy.special.gammaln(numpy.arange(num_arms + 1) + 1.)
+
+    expected_vals = numpy.zeros(max_selected_arms)
+    m = 1
+    while m <= max_selected_arms:
+        # The probability of arm a relative to the best arm is at most
+        # (a/(K-1))^(m-1), so arms below first sum to less than tol
+        if m == 1:
+            first = 0
+        else:
+            first = int(math.floor((num_arms - 1) *
+                                   math.exp(math.log(tol / num_arms) / (m - 1))))
+            first = min(first, num_arms - 1)
+
+        # Process as many values of m as fit in max_elements
+        num_cols = max(1, max_elements // (num_arms - first))
+        ms = numpy.arange(m, min(m + num_cols, max_selected_arms + 1))
+        a = numpy.arange(first, num_arms)[:, None]
+
+        # log C(a, m-1) - log C(K, m)
+        valid = a >= ms - 1
+        log_p = (log_fact[a] - log_fact[ms - 1] - log_fact[numpy.where(valid, a - ms + 1, 0)]
+                 - log_fact[num_arms] + log_fact[ms] + log_fact[num_arms - ms])
+        p = numpy.where(valid, numpy.exp(log_p), 0.)
+        p /= p.sum(axis=0)
 
-    counts = numpy.zeros((num_arms, max_selected_arms))
-    for num_selected in range(0,max_selected_arms):
-        total_possible = scipy.special.binom(num_arms, num_selected+1) * math.factorial(num_selected)
-        counts[:,num_selected] = [scipy.special.binom(a, num_selected)*math.factorial(num_selected) for a in range(num_arms)]
-        counts[:,num_selected] /= float(total_possible)
+        expected_vals[ms - 1] = numpy.dot(arms[first:], p)
+        m = ms[-1] + 1
 
-    expected_vals = numpy.dot(arms, counts)
     return expected_vals
 
 
 if __name__ == '__main__':
+    from ss_plotting import make_plots
+    from scipy.stats import norm
 
     parser = argparse.ArgumentParser(description="Run a trial")
 
@@ -1,5 +1,18 @@
 import numpy
 
+def draw_pvals(arm_dist, num_arms):
+    """
+    @param arm_dist The distribution to draw from: uniform, gauss-left or gauss-right
+    @return The success probabilities of num_arms arms
+    """
+    if arm_dist == 'uniform':
+        return numpy.random.random_sample(num_arms)
+    elif arm_dist == 'gauss-left':
+        return numpy.random.normal(0.3, 0.1, num_arms)
+    elif arm_dist == 'gauss-right':
+        return numpy.random.normal(0.7, 0.1, num_arms)
+    raise ValueError('Unrecognized arm-dist parameter: %s' % arm_dist)
+
 class BinomialDistribution():
 
     def __init__(self, p):
@@ -7,4 +20,43 @@ class BinomialDistribution():
 
     def generate(self, n):
         return numpy.random.binomial(1, self.p, n).tolist()
+
+    def generate_successes(self, n):
+        """
+        @return The number of successes in n pulls
+        """
+        return numpy.random.binomial(n, self.p)
         
+
+class BinomialArmSet(object):
+
+    def __init__(self, pvals):
+        """
+        A set of Bernoulli arms backed by a single array of success
+        probabilities. Behaves like a dictionary mapping arm index to a
+        BinomialDistribution, but the distributions are only created when
+        an arm is looked up, so very large arm sets stay cheap.
+
+        @param pvals The success probability of every arm
+        """
+        self.pvals = numpy.asarray(pvals, dtype=float)
+
+    def __len__(self):
+        return len(self.pvals)
+
+    def __iter__(self):
+        return iter(xrange(len(self.pvals)))
+
+    def __getitem__(self, idx):
+        return BinomialDistribution(self.pvals[idx])
+
+    def keys(self):
+        return numpy.arange(len(self.pvals))
+
+    def generate_successes(self, indices, n):
+        """
+        Pull several arms n times each in a single draw
+        @param indices The indices of the arms to pull
+        @return The number of successes of each arm
+        """
+        return numpy.random.binomial(n, self.pvals[indices])
@@ -1,18 +1,38 @@
 from __future__ import division
-import bisect
-import logging
 import math
 import numpy
-import random
 
 class Evaluator(object):
     
     def __init__(self, name):
         self.name = name
 
-    def solve(self, traj_list, rollout_dict):
+    def solve(self, traj_list, rollouts):
+        '''
+        @param traj_list The trajectories in the order they are considered
+        @param rollouts A boolean matrix whose i-th row holds the rollout
+           results of traj_list[i], or a dictionary mapping trajectory to
+           a list of rollout results
+        '''
         pass
 
+    def rollouts_needed(self, num_trajs, num_rollouts):
+        '''
+        @param num_trajs The number of trajectories
+        @param num_rollouts The number of rollouts recorded for every trajectory
+        @return The number of rollouts of each trajectory solve may read
+        '''
+        return num_rollouts
+
+    @staticmethod
+    def _as_matrix(traj_list, rollouts):
+        '''
+        @return The rollouts as a matrix with one row per trajectory in traj_list
+        '''
+        if isinstance(rollouts, dict):
+            rollouts = [ rollouts[traj] for traj in traj_list ]
+        return numpy.asarray(rollouts, dtype=bool)
+
 
 class FixedRolloutEvaluator(Evaluator):
 
@@ -20,25 +40,21 @@ class FixedRolloutEvaluator(Evaluator):
         Evaluator.__init__(self, 'fixed_%d' % num_rollouts)
         self.num_rollouts = num_rollouts
 
-    def solve(self, traj_list, rollout_dict):
+    def rollouts_needed(self, num_trajs, num_rollouts):
+        return min(self.num_rollouts, num_rollouts)
 
-        results = []
+    def solve(self, traj_list, rollouts):
 
-        k_best = -1
-        for idx in range(len(traj_list)):
-            
-            traj = traj_list[idx]            
-            rollouts = rollout_dict[traj][:self.num_rollouts]
-            k = sum(rollouts)
-            p = float(k)/float(self.num_rollouts)
-            logging.debug('%s: k = %d, p = %0.3f' % (traj, k, p))
-            
-            if k > k_best:
-                results.append((p, (idx+1)*self.num_rollouts, traj))
-                k_best = k
-            
+        rollouts = self._as_matrix(traj_list, rollouts)
+        k = rollouts[:, :self.num_rollouts].sum(axis=1)
 
-        return results
+        # A trajectory is reported when it beats every trajectory before it
+        k_best = numpy.maximum.accumulate(numpy.concatenate(([-1], k[:-1])))
+        selected = numpy.flatnonzero(k > k_best)
+
+        return [ (float(k[idx])/float(self.num_rollouts),
+                  (idx+1)*self.num_rollouts, traj_list[idx])
+                 for idx in selected ]
 
         
 class FailureCountEvaluator(Evaluator):
@@ -46,32 +62,34 @@ class FailureCountEvaluator(Evaluator):
     def __init__(self, max_rollouts):
         Evaluator.__init__(self, 'failure_count_%d' % max_rollouts)
         self.max_rollouts = max_rollouts
-        
 
-    def solve(self, traj_list, rollout_dict):
-        
-        results = []
-        
-        min_failures = self.max_rollouts + 1 # pretend everything failed so far
-        rollout_count = 0
-        for idx in range(len(traj_list)):
-            
-            traj = traj_list[idx]
-            rollouts = rollout_dict[traj][:self.max_rollouts]
+    def rollouts_needed(self, num_trajs, num_rollouts):
+        return min(self.max_rollouts, num_rollouts)
+
+    def solve(self, traj_list, rollouts):
+
+        rollouts = self._as_matrix(traj_list, rollouts)[:, :self.max_rollouts]
+        if rollouts.shape[0] == 0:
+            return []
+        num_rollouts = rollouts.shape[1]
+        failure_counts = numpy.cumsum(~rollouts, axis=1)
+        total_failures = failure_counts[:, -1]
 
-            # now we want to compute cumsum
-            rollout_failures = [not r for r in rollouts]
-            rollout_failure_counts = numpy.cumsum(numpy.array(rollout_failures))
+        # The fewest failures of any trajectory before each one, a trajectory
+        # is reported when it has no more failures than that. Pretend
+        # everything failed before the first trajectory.
+        min_failures = numpy.minimum.accumulate(
+            numpy.concatenate(([self.max_rollouts + 1], total_failures[:-1])))
+        selected = numpy.flatnonzero(total_failures <= min_failures)
 
-            v = bisect.bisect(rollout_failure_counts, min_failures)
-            if v == len(rollout_failure_counts):
-                min_failures = rollout_failure_counts[-1]
-                results.append((float(sum(rollouts))/len(rollouts), rollout_count, traj))
-                rollout_count += len(rollouts)
-            else:
-                rollout_count += v
+        # Each trajectory is rolled out until it has more failures than the
+        # best so far, or all its rollouts if it never does
+        used = numpy.sum(failure_counts <= min_failures[:, None], axis=1)
+        rollout_count = numpy.cumsum(used) - used
 
-        return results
+        successes = rollouts.sum(axis=1)
+        return [ (float(successes[idx])/num_rollouts, rollout_count[idx], traj_list[idx])
+                 for idx in selected ]
 
 
 class SuccessiveRejectsEvaluator(Evaluator):
@@ -85,56 +103,80 @@ class SuccessiveRejectsEvaluator(Evaluator):
         self.rollout_budget = rollout_budget
         self.rollout_step = rollout_step
 
-    def solve(self, traj_list, rollout_dict):
-        results = []
-
-        for n in xrange(2 * self.rollout_step,
-                        self.rollout_budget + 1,
-                        self.rollout_step):
-            result = self.solve_with_budget(traj_list, rollout_dict, n)
-            results.append(result)
-
-        return results
-
-    def solve_with_budget(self, traj_list, rollout_dict, n):
-        results = []
-        num_rollouts = 0
-
+    def _budgets(self):
+        return range(2 * self.rollout_step,
+                     self.rollout_budget + 1,
+                     self.rollout_step)
+
+    def rollouts_needed(self, num_trajs, num_rollouts):
+        # The last remaining trajectory has the most rollouts
+        needed = [ self._n(n, num_trajs - 1, num_trajs) for n in self._budgets() ]
+        return min(max(needed + [0]), num_rollouts)
+
+    def solve(self, traj_list, rollouts):
+        return self.solve_with_budgets(traj_list, rollouts, self._budgets())
+
+    def solve_with_budget(self, traj_list, rollouts, n):
+        return self.solve_with_budgets(traj_list, rollouts, [n])[0]
+
+    def solve_with_budgets(self, traj_list, rollouts, budgets):
+        '''
+        Run successive rejects once for every budget. The runs share the
+        prefix sums of the rollouts and advance through their phases
+        together, so X_hat of every trajectory in a phase is one lookup.
+
+        @param budgets A list of total numbers of rollouts
+        @return A list of (X_hat, num_rollouts, traj) of the selected
+           trajectory for every budget
+        '''
+        rollouts = self._as_matrix(traj_list, rollouts)
+        budgets = numpy.asarray(budgets)
         K = len(traj_list)
-        A = set(traj_list)
-        rollout_offset = { traj: 0 for traj in traj_list }
+        B = len(budgets)
+        if B == 0:
+            return []
 
-        if n <= K:
+        if numpy.any(budgets <= K):
             raise ValueError('Number of rollouts {:d} is less than the number'
-                             ' of trajectories {:d}.'.format(n, K))
+                             ' of trajectories {:d}.'.format(int(budgets.min()), K))
+        if K < 2:
+            raise ValueError('Successive rejects needs at least two trajectories.')
+
+        # successes[i, j] is the number of successes in the first j rollouts of i
+        num_available = rollouts.shape[1]
+        successes = numpy.zeros((K, num_available + 1))
+        successes[:, 1:] = numpy.cumsum(rollouts, axis=1)
+
+        # n_k[b, k] is the number of rollouts of every remaining trajectory
+        # after phase k with budget b
+        k = numpy.arange(1, K)
+        n_k = numpy.zeros((B, K), dtype=int)
+        n_k[:, 1:] = numpy.ceil((1. / self._log_bar(K))
+                                * (budgets[:, None] - K) / (K + 1. - k))
+        num_rollouts = numpy.sum(numpy.diff(n_k, axis=1) * (K + 1 - k), axis=1)
+
+        rows = numpy.arange(B)
+        active = numpy.ones((B, K), dtype=bool)
 
         # There are K trajectories. The successive rejects algorithm rejects
         # exactly one trajectory in each phase, so there are K - 1 phases.
-        for k in xrange(1, K):
-            num_rounds = self._n(n, k, K) - self._n(n, k - 1, K)
-
-            num_rollouts += num_rounds * len(A)
-
-            # Compute the number of rollouts to perform in this phase.
-            X_hat = {}
-
-            for traj in A:
-                offset = rollout_offset[traj]
-                rollouts = rollout_dict[traj][0:offset + num_rounds]
-                rollout_offset[traj] += num_rounds
-                X_hat[traj] = numpy.mean(rollouts)
+        for phase in xrange(1, K):
+            # Rollouts beyond the ones recorded are not available
+            counts = numpy.minimum(n_k[:, phase], num_available)
+            X_hat = successes[:, counts].T / counts[:, None]
+            X_hat[~active] = numpy.inf
 
             # Find the worst trajectory. Randomize in the case of a tie.
-            worst_X_hat = min(X_hat[traj] for traj in A)
-            worst_candidates = [ traj for traj in A
-                                 if abs(X_hat[traj] - worst_X_hat) < 0.0001 ]
-#                                 if numpy.isclose(X_hat[traj], worst_X_hat) ]
-            worst_traj = random.choice(worst_candidates)
-            A.remove(worst_traj)
+            worst_X_hat = X_hat.min(axis=1)
+            candidates = active & (numpy.abs(X_hat - worst_X_hat[:, None]) < 0.0001)
+            keys = numpy.random.random_sample((B, K))
+            keys[~candidates] = -1.
+            active[rows, numpy.argmax(keys, axis=1)] = False
 
-        assert len(A) == 1
-        best_traj = A.pop()
-        return X_hat[best_traj], num_rollouts, best_traj
+        best = numpy.argmax(active, axis=1)
+        counts = numpy.minimum(n_k[:, K - 1], num_available)
+        p = successes[best, counts] / counts
+        return [ (p[b], num_rollouts[b], traj_list[best[b]]) for b in xrange(B) ]
 
     @classmethod
     def _n(cls, n, k, K):
@@ -146,5 +188,4 @@ class SuccessiveRejectsEvaluator(Evaluator):
 
     @staticmethod
     def _log_bar(k):
-        return 0.5 + sum(1. / i for i in xrange(2, k + 1))
-
+        return 0.5 + numpy.sum(1. / numpy.arange(2, k + 1))
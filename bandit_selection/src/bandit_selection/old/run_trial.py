@@ -1,5 +1,5 @@
 #!/usr/bin/env python
-import argparse, copy, csv, logging, os, random, re
+import argparse, logging, numpy, os, random, re
 from evaluator import *
 #from plots.plot_stability_time_success import *
 
@@ -24,7 +24,7 @@ def parse_evalutors(evaluator_list):
         m = re.search('([0-9]+)failure', ename)
         if m is not None:
             max_rollouts = int(m.group(1))
-            logging.info('Adding FailureCountEvaluator with %d rollouts', num_rollouts)
+            logging.info('Adding FailureCountEvaluator with %d rollouts', max_rollouts)
             evaluators.append(FailureCountEvaluator(max_rollouts))
             continue
 
@@ -35,75 +35,273 @@ def parse_evalutors(evaluator_list):
             logging.info('Adding SuccessiveRejectsEvaluator with %d budget',
                          rollout_budget)
             evaluators.append(SuccessiveRejectsEvaluator(rollout_budget, 400))
+            continue
         
         logging.error('Did not recognize evaluator: %s', ename)
 
     return evaluators
 
-def load_traj_data(infiles):
+def _cache_files(infile, names):
+    '''
+    @return The cache file next to infile for every name
+    '''
+    return [ '%s.%s.npy' % (infile, name) for name in names ]
+
+def _load_cache(infile, cache_files):
+    '''
+    @return The arrays stored in cache_files, memory mapped, or None if any
+       of them is missing or older than infile
+    '''
+    mtime = os.path.getmtime(infile)
+    for cache_file in cache_files:
+        if not os.path.exists(cache_file) or os.path.getmtime(cache_file) < mtime:
+            return None
+    logging.info('Loading cached data for %s' % infile)
+    return [ numpy.load(cache_file, mmap_mode='r') for cache_file in cache_files ]
+
+def _save_cache(cache_files, arrays):
+    for cache_file, array in zip(cache_files, arrays):
+        try:
+            numpy.save(cache_file, array)
+        except IOError as e:
+            logging.warning('Failed to write cache file %s: %s' % (cache_file, e))
+
+def parse_traj_file(infile):
+    '''
+    @param infile A file containing a header and one row per trajectory: the
+       trajectory id followed by space separated True/False rollout results
+    @return A tuple (traj_ids, rollouts): an array of trajectory ids and a
+       boolean matrix with one row per trajectory and one column per rollout
+    '''
+    traj_ids = []
+    rows = []
+    with open(infile, 'r') as f:
+        next(f, None) #skip the header
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            parts = line.split(' ', 1)
+            traj_ids.append(parts[0])
+            values = parts[1] if len(parts) > 1 else ''
+            values = values.replace('True', '1').replace('False', '0').replace(' ', '')
+            rows.append(numpy.frombuffer(values, dtype=numpy.uint8))
+
+    num_rollouts = set(len(row) for row in rows)
+    if len(num_rollouts) > 1:
+        raise ValueError('Trajectories in %s have different numbers of rollouts: %s'
+                         % (infile, sorted(num_rollouts)))
+
+    if not rows:
+        return numpy.array(traj_ids), numpy.zeros((0, 0), dtype=bool)
+    rollouts = numpy.array(rows, dtype=numpy.uint8)
+    if numpy.any((rollouts != ord('0')) & (rollouts != ord('1'))):
+        raise ValueError('Rollout results in %s must be True or False' % infile)
+    return numpy.array(traj_ids), rollouts == ord('1')
+
+def load_traj_matrix(infiles, cache=True):
     '''
     @param infiles A list of files containing rollout data for a set of trajectories
-    @return rollout_dict A dictionary mapping traj_id to a list of True/False values
-       indicating rollout results
+    @param cache If true, the parsed data of every file is saved to
+       <infile>.ids.npy and <infile>.rollouts.npy and memory mapped from
+       there while it is newer than the file
+    @return traj_ids A list of trajectory ids
+    @return rollouts A boolean matrix with one row of rollout results per trajectory
     '''
-    rollout_dict = {}
+    all_ids = []
+    all_rollouts = []
     for infile in infiles:
         logging.info('Loading data file %s' % infile)
-        with open(infile, 'r') as f:
-            rollout_data = csv.reader(f, delimiter=' ')
-            next(rollout_data, None) #skip the header
-            for row in rollout_data:
-                test_id = row[0]
-                rollout_dict[test_id] = [True if v == 'True' else False for v in row[1:]]
-    return rollout_dict
+        cache_files = _cache_files(infile, ['ids', 'rollouts'])
+        data = _load_cache(infile, cache_files) if cache else None
+        if data is None:
+            data = parse_traj_file(infile)
+            if cache:
+                _save_cache(cache_files, data)
+        all_ids += data[0].tolist()
+        all_rollouts.append(data[1])
 
-def load_ground_truth(infiles):
+    if len(all_rollouts) == 1:
+        return all_ids, all_rollouts[0]
+    if len(set(r.shape[1] for r in all_rollouts)) > 1:
+        raise ValueError('Trajectories in %s have different numbers of rollouts' % infiles)
+    return all_ids, numpy.concatenate(all_rollouts)
+
+def load_traj_data(infiles, cache=True):
+    '''
+    @param infiles A list of files containing rollout data for a set of trajectories
+    @return rollout_dict A dictionary mapping traj_id to a list of True/False values
+       indicating rollout results
+    '''
+    traj_ids, rollouts = load_traj_matrix(infiles, cache=cache)
+    return { traj: rollouts[idx].tolist() for idx, traj in enumerate(traj_ids) }
+
+def load_ground_truth_array(infiles, cache=True):
     '''
     @param infiles The files containing ground truth data
-    @return A dictionary mapping trajectory id to ground truth probability
+    @param cache If true, cache the parsed data of every file in
+       <infile>.ids.npy and <infile>.pvals.npy
+    @return traj_ids A list of trajectory ids
+    @return pvals An array of the ground truth probability of every trajectory
     '''
-    ground_truth_dict = {}
+    all_ids = []
+    all_pvals = []
     for infile in infiles:
         logging.info('Loading ground truth file %s' % infile)
-        with open(infile, 'r') as f:
-            gt_data = csv.reader(f, delimiter=' ')
-            next(gt_data, None) #skip the header
-            for row in gt_data:
-                test_id = row[0]
-                pval = float(row[1])
-                ground_truth_dict[test_id] = pval
-    return ground_truth_dict
+        cache_files = _cache_files(infile, ['ids', 'pvals'])
+        data = _load_cache(infile, cache_files) if cache else None
+        if data is None:
+            with open(infile, 'r') as f:
+                next(f, None) #skip the header
+                rows = [ line.split() for line in f if line.strip() ]
+            data = (numpy.array([ row[0] for row in rows ]),
+                    numpy.array([ float(row[1]) for row in rows ]))
+            if cache:
+                _save_cache(cache_files, data)
+        all_ids += data[0].tolist()
+        all_pvals.append(data[1])
+    return all_ids, numpy.concatenate(all_pvals)
 
+def load_ground_truth(infiles, cache=True):
+    '''
+    @param infiles The files containing ground truth data
+    @return A dictionary mapping trajectory id to ground truth probability
+    '''
+    traj_ids, pvals = load_ground_truth_array(infiles, cache=cache)
+    return dict(zip(traj_ids, pvals.tolist()))
+
+
+def sample_rollouts(successes, num_rollouts, num_samples):
+    '''
+    Draw the first rollouts of a random permutation of the rollouts of every
+    trajectory. Only the number of successes of a trajectory matters, so
+    each draw is a draw without replacement from an urn holding the
+    rollouts that have not been drawn yet.
 
-def run_trial(traj_list, rollout_dict, evaluator_list):
+    @param successes The number of successful rollouts of every trajectory
+    @param num_rollouts The number of rollouts of every trajectory
+    @param num_samples The number of rollouts to draw
+    @return A boolean matrix with num_samples rollout results per trajectory
+    '''
+    remaining = numpy.array(successes, dtype=float)
+    samples = numpy.empty((len(remaining), num_samples), dtype=bool)
+    for idx in xrange(num_samples):
+        draw = numpy.random.random_sample(len(remaining)) * (num_rollouts - idx) < remaining
+        samples[:, idx] = draw
+        remaining -= draw
+    return samples
+
+def run_trial(traj_list, rollouts, evaluator_list, successes=None):
     '''
     @param traj_list The list of all trajectories to use during the trial
-    @param rollout_dict A dictionary of rollouts 
-        (key: traj  - should be in traj_list, 
-         value: list of True/False values indicating success or failure of rollout)
+    @param rollouts A boolean matrix whose i-th row holds the True/False
+        rollout results of traj_list[i]
+    @param successes The number of successes in every row of rollouts,
+        computed from rollouts if not given
     @return A dictionary that maps evaluator to results
     '''
-    # First permute the list of trajectories
-    random.shuffle(traj_list)
-
-    # Next permute the rollouts for each trajectory
-    rollout_order = {}
-    for traj in traj_list:
+    num_trajs, num_rollouts = rollouts.shape
+    if successes is None:
+        successes = rollouts.sum(axis=1)
 
-        # grab the raw rollout list
-        rollout_list = copy.copy(rollout_dict[traj])
+    # First permute the list of trajectories
+    order = numpy.random.permutation(num_trajs)
+    traj_order = [ traj_list[idx] for idx in order ]
 
-        # permute it
-        random.shuffle(rollout_list)
-        rollout_order[traj] = rollout_list
+    # Next permute the rollouts for each trajectory, only as far as
+    # the evaluators read them
+    num_samples = max(ev.rollouts_needed(num_trajs, num_rollouts) for ev in evaluator_list)
+    rollout_order = sample_rollouts(successes[order], num_rollouts, num_samples)
 
     results = {}
     for evaluator in evaluator_list:
         logging.debug('Solving with evluator: %s' % evaluator.name)
-        results[evaluator] = evaluator.solve(traj_list, rollout_order)
+        results[evaluator] = evaluator.solve(traj_order, rollout_order)
 
     return results
-            
+
+# The data shared by every trial run in a worker process
+_worker = {}
+
+def _init_worker(infile, evaluator_names, seed):
+    '''
+    Load the rollout matrix of a worker. The matrix is memory mapped from
+    the cache written by load_traj_matrix, so every worker shares the same
+    pages instead of holding its own copy.
+    '''
+    traj_ids, rollouts = load_traj_matrix([infile])
+    _worker['rollouts'] = rollouts
+    _worker['successes'] = rollouts.sum(axis=1)
+    _worker['evaluators'] = parse_evalutors(evaluator_names)
+    _worker['seed'] = seed
+
+def _run_worker_trial(trial):
+    '''
+    Run a single trial, seeded by the run seed and the trial index so the
+    results do not depend on how trials are spread across workers
+    @return The columns (evaluator, traj, num_rollouts, p_est) of the
+        results, trajectories are given by their row in the rollout matrix
+    '''
+    random.seed(_worker['seed'] + trial)
+    numpy.random.seed(_worker['seed'] + trial)
+
+    rollouts = _worker['rollouts']
+    evaluators = _worker['evaluators']
+    trial_results = run_trial(range(rollouts.shape[0]), rollouts, evaluators,
+                              successes=_worker['successes'])
+
+    columns = ([], [], [], [])
+    for eidx, ev in enumerate(evaluators):
+        for p_est, num_rollouts, traj in trial_results[ev]:
+            columns[0].append(eidx)
+            columns[1].append(traj)
+            columns[2].append(num_rollouts)
+            columns[3].append(p_est)
+    return columns
+
+def run_trials(infile, evaluator_names, num_trials, seed=0, processes=None):
+    '''
+    Run independent trials, spread across a pool of processes
+    @param infile A file containing rollout data for a set of trajectories
+    @param evaluator_names The evaluators to use (ex: 30fixed, 150failure, 50bandit)
+    @param seed Trial i is seeded with seed + i
+    @param processes The number of processes, 1 runs every trial in this process
+    @return A dictionary of result columns: trial, evaluator, traj,
+        num_rollouts and p_est with one entry per reported trajectory
+    '''
+    # Parse the data once so the workers can map the cache
+    load_traj_matrix([infile])
+
+    initargs = (infile, evaluator_names, seed)
+    if processes == 1:
+        _init_worker(*initargs)
+        trial_results = map(_run_worker_trial, xrange(num_trials))
+    else:
+        import multiprocessing
+        pool = multiprocessing.Pool(processes, initializer=_init_worker,
+                                    initargs=initargs)
+        num_workers = processes or multiprocessing.cpu_count()
+        chunksize = max(1, num_trials // (4 * num_workers))
+        trial_results = pool.map(_run_worker_trial, xrange(num_trials), chunksize)
+        pool.close()
+        pool.join()
+
+    lengths = [ len(columns[0]) for columns in trial_results ]
+    results = { 'trial': numpy.repeat(numpy.arange(num_trials), lengths) }
+    for idx, name in enumerate(['evaluator', 'traj', 'num_rollouts']):
+        results[name] = numpy.array(
+            [ v for columns in trial_results for v in columns[idx] ], dtype=numpy.int64)
+    results['p_est'] = numpy.array(
+        [ v for columns in trial_results for v in columns[3] ], dtype=float)
+    return results
+
+def load_results(outfile):
+    '''
+    @param outfile A file written by the __main__ of this script
+    @return A dictionary of result columns, trajectory ids and evaluator names
+    '''
+    data = numpy.load(outfile)
+    return { key: data[key] for key in data.files }
 
 if __name__ == '__main__':
     
@@ -114,10 +312,14 @@ if __name__ == '__main__':
                         help="The number of trials to run")
     parser.add_argument("--evaluators", required=True, nargs='+',
                         help="The evaluators to use (ex: 30fixed, 150failure, 50bandit)")
-    parser.add_argument("--savedir", default=None, 
-                        help="The directory to save results to")
+    parser.add_argument("--outfile", default=None, 
+                        help="The .npz file to save the results of every trial to")
     parser.add_argument("--ground", required=True,
                         help="A set of files containing ground truth probabilities for every trajectory in infiles")
+    parser.add_argument("--processes", default=None, type=int,
+                        help="The number of processes to run trials in, defaults to the number of cores")
+    parser.add_argument("--seed", default=None, type=int,
+                        help="The seed of the first trial, trial i uses seed + i")
     parser.add_argument("--saveplot", dest="saveplot", default=None,
                         help="The filename to save the plot")
     parser.add_argument("--debug", action="store_true",
@@ -130,50 +332,29 @@ if __name__ == '__main__':
     else:
         logging.basicConfig(level=logging.INFO)
 
-    savedir = args.savedir
-    if savedir is not None and os.path.exists(savedir):
-        print 'Removing all data in %s' % savedir
-        import shutil
-        shutil.rmtree(savedir)
-        os.makedirs(savedir)
-    
-
     evaluators = parse_evalutors(args.evaluators)
     if len(evaluators) != len(args.evaluators):
         print 'Failed to parse evaluators'
         exit(0)
     
-    rollout_dict = load_traj_data([args.infile])
-    logging.info('Loaded %d trajectories with %d rollouts each' % (len(rollout_dict.keys()), len(rollout_dict.values()[0])))
+    traj_ids, rollouts = load_traj_matrix([args.infile])
+    logging.info('Loaded %d trajectories with %d rollouts each' % rollouts.shape)
     
     ground_truth = load_ground_truth([args.ground])
+    p_act = numpy.array([ ground_truth[traj] for traj in traj_ids ])
 
-    for idx in range(args.numtrials):
-        logging.info('Running trial %d of %d' % (idx, args.numtrials))
-        
-        trial_results = run_trial(rollout_dict.keys(), rollout_dict, evaluators)
-        if savedir is None:
-            continue
+    seed = args.seed if args.seed is not None else random.randint(0, 2**30)
+    logging.info('Running %d trials with seed %d' % (args.numtrials, seed))
+    results = run_trials(args.infile, args.evaluators, args.numtrials,
+                         seed=seed, processes=args.processes)
 
-        # Save off the results
-        trial_directory = os.path.join(savedir, 'test%d' % idx)
-        if not os.path.exists(trial_directory):
-            os.makedirs(trial_directory)
-
-        for ev, result in trial_results.items():
-            outfile = os.path.join(trial_directory, '%s.csv' % ev.name)
-            with open(outfile, 'w') as f:
-                header = ['traj_id', 'num_rollouts', 'p_est', 'p_act']
-                f.write(' '.join(header))
-                f.write('\n')
-                for pt in result:
-                    traj_id = str(pt[2])
-                    p_est = pt[0]
-                    p_act = ground_truth[traj_id]
-                    num_rollouts = pt[1]
-                    data_row = [traj_id, str(num_rollouts), str(p_est), str(p_act)]
-                    f.write(' '.join(data_row))
-                    f.write('\n')
+    if args.outfile is not None:
+        results['p_act'] = p_act[results['traj']]
+        results['traj_ids'] = numpy.array(traj_ids)
+        results['evaluators'] = numpy.array([ ev.name for ev in evaluators ])
+        results['seed'] = numpy.array(seed)
+        numpy.savez(args.outfile, **results)
+        logging.info('Saved %d results to %s' % (len(results['trial']), args.outfile))
 
     print 'Done'
     #if savedir is not None:
@@ -1,8 +1,9 @@
 import argparse, logging, numpy
-from distributions.binomial import BinomialDistribution
+from distributions.binomial import BinomialArmSet, draw_pvals
 from algorithms.equal_allocation import EqualAllocation
 from algorithms.successive_rejects import SuccessiveRejects
 from algorithms.ucb_e import UCB_E
+from algorithms.lucb import LUCB
 from utils.data_logger import DataLogger
 
 logger = logging.getLogger('bandit_test')
@@ -19,9 +20,22 @@ if __name__ == "__main__":
                         help="The number of arms to select from")
     parser.add_argument("--budget", type=int, default=1000,
                         help="The total number of tests that can be performed")
-    parser.add_argument("--algo", type=str, choices=['equal', 'ucbe', 'sr'], nargs='+',
+    parser.add_argument("--algo", type=str, choices=['equal', 'ucbe', 'sr', 'lucb'], nargs='+',
                         default=['sr'],
                         help="The algorithm to use")
+    parser.add_argument("--num-trials", type=int, default=1,
+                        help="If greater than 1, run this many vectorized Monte-Carlo trials of each algorithm")
+    parser.add_argument("--executor", type=str, choices=['serial', 'thread', 'process'],
+                        default=None,
+                        help="Dispatch the rollouts of each successive rejects phase through this executor")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="The number of executor workers, defaults to the number of cores")
+    parser.add_argument("--no-plot", action="store_true",
+                        help="Do not log every pull or plot the arm selected over time")
+    parser.add_argument("--max-plot-arms", type=int, default=1000,
+                        help="Do not log or plot with more arms than this")
+    parser.add_argument("--confidence", type=float, default=None,
+                        help="Stop each algorithm once it is this confident in the selected arm, LUCB uses 1 - confidence as its delta")
     args = parser.parse_args()
 
     num_arms = args.num_arms
@@ -31,22 +45,47 @@ if __name__ == "__main__":
 
     logger.info('Selecting best of %d arms using %d tests' % (num_arms, budget))
 
-    if args.arm_dist == 'uniform':
-        pvals = numpy.random.random_sample(num_arms)
-    elif args.arm_dist == 'gauss-left':
-        pvals = numpy.random.normal(0.3, 0.1, num_arms)
-    elif args.arm_dist == 'gauss-right':
-        pvals = numpy.random.normal(0.7, 0.1, num_arms)
-    else:
-        logger.error('Unrecognized arm-dist parameter: %s' % args.arm_dist)
+    pvals = draw_pvals(args.arm_dist, num_arms)
+
+    if args.num_trials > 1:
+        from algorithms import vectorized
+        best_arm = numpy.argmax(pvals)
+        for name in args.algo:
+            if name == 'equal':
+                selected = vectorized.equal_allocation_trials(pvals, budget, args.num_trials)
+            elif name == 'ucbe':
+                selected = vectorized.ucb_e_trials(pvals, budget, 50, args.num_trials)
+            elif name == 'sr':
+                selected = vectorized.successive_rejects_trials(pvals, budget, args.num_trials)
+            else:
+                logger.warn('No vectorized version of %s, skipping' % name)
+                continue
+            dist = vectorized.selection_distribution(selected, num_arms)
+            logger.info('%s: P(correct) = %0.4f over %d trials' % (name, dist[best_arm], args.num_trials))
+            for idx in numpy.argsort(-dist):
+                if dist[idx] == 0.:
+                    break
+                logger.info('\t%d (p = %0.3f): %0.4f' % (idx, pvals[idx], dist[idx]))
         exit(0)
 
-    arms = {}
-    for idx in range(num_arms):
-        arms[idx] = BinomialDistribution(pvals[idx])
-        logger.info('\t%d: %0.3f' % (idx, pvals[idx]))
+    arms = BinomialArmSet(pvals)
+    if num_arms <= 100:
+        for idx in range(num_arms):
+            logger.info('\t%d: %0.3f' % (idx, pvals[idx]))
+
+    # Logging every pull keeps algorithms from batching their pulls, only
+    # do it when the selections will be plotted
+    data_logger = None
+    if not args.no_plot:
+        if num_arms <= args.max_plot_arms:
+            data_logger = DataLogger(arms)
+        else:
+            logger.info('Not plotting the selections of more than %d arms' % args.max_plot_arms)
 
-    data_logger = DataLogger(arms)
+    executor = None
+    if args.executor is not None:
+        from utils.executor import make_executor
+        executor = make_executor(args.executor, args.processes)
 
     algos = []
 
@@ -56,13 +95,25 @@ if __name__ == "__main__":
         elif name == 'ucbe':
             algos += [ UCB_E(arms, budget, a = 50, data_logger = data_logger) ]
         elif name == 'sr':
-            algos += [ SuccessiveRejects(arms, budget, data_logger = data_logger) ]
+            algos += [ SuccessiveRejects(arms, budget, data_logger = data_logger,
+                                         executor = executor) ]
+        elif name == 'lucb':
+            delta = 1. - args.confidence if args.confidence is not None else 0.05
+            algos += [ LUCB(arms, budget, delta = delta, data_logger = data_logger) ]
         else:
             logger.error("Unrecognized algorithm: %s" % name)
 
-    for algo in algos:
-        selected_arm = algo.solve()
+    try:
+        for algo in algos:
+            selected_arm = algo.solve(confidence = args.confidence)
 
-        logger.info('%s: Selected arm %d: p = %0.3f' % (algo.name, selected_arm, arms[selected_arm].p))
+            logger.info('%s: Selected arm %d: p = %0.3f after %d pulls (confidence %0.3f)'
+                        % (algo.name, selected_arm, arms[selected_arm].p,
+                           algo.num_pulls, algo.confidence()))
+    finally:
+        if executor is not None:
+            executor.close()
+            executor.join()
 
-    data_logger.plot_time_selection()
+    if data_logger is not None:
+        data_logger.plot_time_selection()
@@ -1,70 +1,181 @@
 import numpy
-import matplotlib.pyplot as plt
-from ss_plotting import make_plots
-colors = ['blue', 'green', 'red', 'purple', 'black', 'orange', 'pink']
+
+class DeltaLog(object):
+    """
+    A growable columnar record of (arm, pulls, successes) deltas
+    """
+    def __init__(self, capacity=1024):
+        self.size = 0
+        self.arms = numpy.zeros(capacity, dtype=numpy.int64)
+        self.pulls = numpy.zeros(capacity, dtype=numpy.int64)
+        self.successes = numpy.zeros(capacity, dtype=numpy.int64)
+
+    def append(self, arm, pulls, successes):
+        if self.size == len(self.arms):
+            capacity = 2*len(self.arms)
+            for name in ['arms', 'pulls', 'successes']:
+                column = numpy.zeros(capacity, dtype=numpy.int64)
+                column[:self.size] = getattr(self, name)
+                setattr(self, name, column)
+        self.arms[self.size] = arm
+        self.pulls[self.size] = pulls
+        self.successes[self.size] = successes
+        self.size += 1
+
+    def extend(self, arms, pulls, successes):
+        """
+        Append a delta for every entry of the arms, pulls and successes arrays
+        """
+        arms = numpy.asarray(arms)
+        num = len(arms)
+        if self.size + num > len(self.arms):
+            capacity = max(self.size + num, 2*len(self.arms))
+            for name in ['arms', 'pulls', 'successes']:
+                column = numpy.zeros(capacity, dtype=numpy.int64)
+                column[:self.size] = getattr(self, name)[:self.size]
+                setattr(self, name, column)
+        self.arms[self.size:self.size + num] = arms
+        self.pulls[self.size:self.size + num] = pulls
+        self.successes[self.size:self.size + num] = successes
+        self.size += num
 
 class DataLogger(object):
 
     def __init__(self, arms):
+        """
+        @param arms A dictionary mapping arm id to arm
+        """
         self.pts = {}
         self.arms = arms
-    
-    def log(self, algo, all_results):
+        self._set_arm_ids(arms.keys())
+
+    def _set_arm_ids(self, arm_ids):
+        """
+        Ids that are already 0..K-1, as the keys of a BinomialArmSet, are
+        their own index and need no lookup table
+        """
+        if isinstance(arm_ids, numpy.ndarray) and arm_ids.dtype.kind in 'iu' and \
+                numpy.array_equal(arm_ids, numpy.arange(len(arm_ids))):
+            self.arm_ids = arm_ids
+            self._arm_index = None
+        else:
+            self.arm_ids = arm_ids.tolist() if isinstance(arm_ids, numpy.ndarray) else list(arm_ids)
+            self._arm_index = {arm: idx for idx, arm in enumerate(self.arm_ids)}
+
+    def log(self, algo, arm, pulls, successes):
+        """
+        Record that an arm was pulled
+        @param algo The name of the algorithm
+        @param arm The id of the arm
+        @param pulls The number of times the arm was pulled
+        @param successes The number of those pulls that succeeded
+        """
         if algo not in self.pts:
-            self.pts[algo] = []
-        self.pts[algo].append(all_results)
+            self.pts[algo] = DeltaLog()
+        idx = arm if self._arm_index is None else self._arm_index[arm]
+        self.pts[algo].append(idx, pulls, successes)
 
-    def plot_arm_dist(self, dist):
-        num_samples = 100000
-        if dist == 'uniform':
-            pvals = numpy.random.random_sample(num_samples)
-        elif dist == 'gauss-left':
-            pvals = numpy.random.normal(0.3, 0.1, num_samples)
-        elif dist == 'gauss-right':
-            pvals = numpy.random.normal(0.7, 0.1, num_samples)
-
-        edges = numpy.arange(0., 1., 0.01)
-        vals, edges = numpy.histogram(pvals, edges, density=True)
-        centers = [edges[i] + 0.5*(edges[i+1] - edges[i]) for i in range(len(edges)-1)]
-        
-        make_plots.plot([(centers, vals)], ['grey'], 
-                        group_color_emphasis=[True],
-                        plot_ylim=[0, max(vals)+0.01],
-                        show_plot=True)
-            
-    def plot_time_selection(self):
+    def log_many(self, algo, arms, pulls, successes):
+        """
+        Record that several arms were pulled, in order
+        @param arms An array of arm ids
+        @param pulls The number of times each arm was pulled, a scalar or an array
+        @param successes An array with the number of successes of each arm
+        """
+        if algo not in self.pts:
+            self.pts[algo] = DeltaLog()
+        if self._arm_index is None:
+            indices = arms
+        else:
+            indices = [self._arm_index[arm] for arm in arms]
+        self.pts[algo].extend(indices, pulls, successes)
+
+    def save(self, filename):
+        """
+        Save every recorded delta to a .npz file
+        """
+        columns = {'arm_ids': numpy.array(self.arm_ids),
+                   'algos': numpy.array(self.pts.keys())}
+        for idx, algo in enumerate(self.pts.keys()):
+            d = self.pts[algo]
+            columns['arms_%d' % idx] = d.arms[:d.size]
+            columns['pulls_%d' % idx] = d.pulls[:d.size]
+            columns['successes_%d' % idx] = d.successes[:d.size]
+        numpy.savez(filename, **columns)
+
+    @classmethod
+    def load(cls, filename, arms):
+        """
+        @param filename A file written by save
+        @param arms The dictionary of arms the deltas were recorded against
+        @return A DataLogger holding the saved deltas
+        """
+        data = numpy.load(filename)
+        logger = cls(arms)
+        logger._set_arm_ids(data['arm_ids'])
+        for idx, algo in enumerate(data['algos'].tolist()):
+            d = DeltaLog(capacity=max(1, len(data['arms_%d' % idx])))
+            d.size = len(data['arms_%d' % idx])
+            d.arms[:d.size] = data['arms_%d' % idx]
+            d.pulls[:d.size] = data['pulls_%d' % idx]
+            d.successes[:d.size] = data['successes_%d' % idx]
+            logger.pts[algo] = d
+        return logger
 
-        arms = [ (k, v.p) for k,v in self.arms.iteritems() ]
-        sorted_arms = sorted(arms, key = lambda x: x[1])
+    def time_selection(self):
+        """
+        @return A list of (algo, budgets, ranks) with the rank, by success
+          probability, of the arm each algorithm would select after every delta
+        """
+        pvals = numpy.array([self.arms[arm].p for arm in self.arm_ids])
+        rank = numpy.empty(len(pvals), dtype=int)
+        rank[numpy.argsort(pvals, kind='mergesort')] = numpy.arange(len(pvals))
 
-        data_sets = []
-        data_labels = []
+        selections = []
         for algo in self.pts.keys():
-            
-            data = []
-            
-            for pt in self.pts[algo]:
-                
-                budget = sum([len(v) for v in pt.values()])
-                best = self._get_best(pt)
-                best_idx = [x[0] for x in sorted_arms].index(best)
-                
-                data.append((budget, best_idx))
-                
-            xvals = [pt[0] for pt in data]
-            yvals = [pt[1] for pt in data]
-            data_sets.append((xvals, yvals))
-            data_labels.append(algo)
-        
-        make_plots.plot(data_sets, colors[:len(data_sets)], 
-                        [True for x in data_sets],
-                        group_labels=data_labels, 
-                        plot_xlabel = 'Budget',
-                        plot_ylabel = 'Selected Arm')
+            budgets, best = self._get_best(self.pts[algo], len(self.arm_ids))
+            selections.append((algo, budgets, rank[best]))
+        return selections
+
+    def plot_arm_dist(self, dist):
+        from plotting import plot_arm_dist
+        plot_arm_dist(dist)
+
+    def plot_time_selection(self):
+        from plotting import plot_time_selection
+        plot_time_selection(self)
 
     @staticmethod
-    def _get_best(all_results):
-        
-        X_hat = { arm: numpy.mean(all_results[arm]) for arm in all_results.keys()}
-        
-        return max(X_hat.keys(), key = lambda x: X_hat[x])
+    def _get_best(deltas, num_arms, max_elements=10**7):
+        """
+        Reconstruct the arm with the highest X_hat after every delta.
+        Running totals are cumulative sums over the deltas, computed in
+        chunks of at most max_elements (delta, arm) entries.
+
+        @param deltas A DeltaLog
+        @param num_arms The number of arms
+        @return The budget spent and the index of the best arm after every delta
+        """
+        budgets = numpy.cumsum(deltas.pulls[:deltas.size])
+        best = numpy.zeros(deltas.size, dtype=int)
+
+        pulls = numpy.zeros(num_arms, dtype=numpy.int64)
+        successes = numpy.zeros(num_arms, dtype=numpy.int64)
+        chunk_size = max(1, max_elements // num_arms)
+        for start in xrange(0, deltas.size, chunk_size):
+            end = min(start + chunk_size, deltas.size)
+            rows = numpy.arange(end - start)
+
+            P = numpy.zeros((end - start, num_arms), dtype=numpy.int64)
+            P[rows, deltas.arms[start:end]] = deltas.pulls[start:end]
+            P = numpy.cumsum(P, axis=0) + pulls
+
+            S = numpy.zeros((end - start, num_arms), dtype=numpy.int64)
+            S[rows, deltas.arms[start:end]] = deltas.successes[start:end]
+            S = numpy.cumsum(S, axis=0) + successes
+
+            X_hat = S / numpy.maximum(P, 1).astype(float)
+            best[start:end] = numpy.argmax(X_hat, axis=1)
+            pulls, successes = P[-1], S[-1]
+
+        return budgets, best
@@ -0,0 +1,46 @@
+"""
+Executors for dispatching batches of arm rollouts.
+
+Anything with a map(func, iterable) method that returns results in order
+can be used, including the pools created here and concurrent.futures
+executors.
+"""
+
+class SerialExecutor(object):
+    """
+    Runs every task in the calling process. Useful as a local stand-in
+    for a remote worker farm.
+    """
+    def map(self, func, iterable):
+        return [func(task) for task in iterable]
+
+    def close(self):
+        pass
+
+    def join(self):
+        pass
+
+def _reseed():
+    """
+    Forked workers inherit the random state of the parent. Reseed each one
+    so workers do not generate identical rollouts.
+    """
+    import numpy, random
+    numpy.random.seed()
+    random.seed()
+
+def make_executor(kind='serial', processes=None):
+    """
+    @param kind One of serial, thread or process
+    @param processes The number of workers, defaults to the number of cores
+    @return An executor with a map method
+    """
+    if kind == 'serial':
+        return SerialExecutor()
+    elif kind == 'thread':
+        from multiprocessing.pool import ThreadPool
+        return ThreadPool(processes)
+    elif kind == 'process':
+        from multiprocessing import Pool
+        return Pool(processes, initializer=_reseed)
+    raise ValueError('Unknown executor: %s' % kind)
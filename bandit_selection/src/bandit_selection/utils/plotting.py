@@ -0,0 +1,46 @@
+"""
+Plots of recorded results. This is the only module in utils that needs
+matplotlib and ss_plotting, so it is imported only when a plot is made.
+"""
+import numpy
+from ss_plotting import make_plots
+colors = ['blue', 'green', 'red', 'purple', 'black', 'orange', 'pink']
+
+def plot_arm_dist(dist):
+    """
+    Plot the density of success probabilities arms are drawn from
+    @param dist One of uniform, gauss-left or gauss-right
+    """
+    num_samples = 100000
+    if dist == 'uniform':
+        pvals = numpy.random.random_sample(num_samples)
+    elif dist == 'gauss-left':
+        pvals = numpy.random.normal(0.3, 0.1, num_samples)
+    elif dist == 'gauss-right':
+        pvals = numpy.random.normal(0.7, 0.1, num_samples)
+
+    edges = numpy.arange(0., 1., 0.01)
+    vals, edges = numpy.histogram(pvals, edges, density=True)
+    centers = [edges[i] + 0.5*(edges[i+1] - edges[i]) for i in range(len(edges)-1)]
+
+    make_plots.plot([(centers, vals)], ['grey'],
+                    group_color_emphasis=[True],
+                    plot_ylim=[0, max(vals)+0.01],
+                    show_plot=True)
+
+def plot_time_selection(data_logger):
+    """
+    Plot the rank of the arm each algorithm would select against the budget spent
+    @param data_logger The DataLogger the algorithms recorded to
+    """
+    data_sets = []
+    data_labels = []
+    for algo, budgets, ranks in data_logger.time_selection():
+        data_sets.append((budgets, ranks))
+        data_labels.append(algo)
+
+    make_plots.plot(data_sets, colors[:len(data_sets)],
+                    [True for x in data_sets],
+                    group_labels=data_labels,
+                    plot_xlabel = 'Budget',
+                    plot_ylabel = 'Selected Arm')
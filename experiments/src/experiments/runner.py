@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+"""
+Run a sweep of experiments described by a config file.
+
+A config lists experiments, each a task from tasks.py with fixed params and
+a grid of values to sweep. Every combination of grid values is run once per
+seed. Results are stored in a sqlite database keyed by (task, params, seed),
+so running the same config again skips every job that already finished and
+a sweep that dies can be resumed.
+
+Example config (see ../../configs/example.json):
+  {"store": "sweep.db",
+   "seeds": [0, 1, 2],
+   "experiments": [
+     {"task": "bandit",
+      "params": {"num_arms": 20, "budget": 1000},
+      "grid": {"algo": ["equal", "ucbe", "sr"],
+               "arm_dist": ["uniform", "gauss-right"]}}]}
+
+Example:
+  ./runner.py ../../configs/example.json --processes 4
+  ./runner.py ../../configs/example.json --summary
+"""
+import argparse, hashlib, itertools, json, logging, os, sqlite3, time, timeit, traceback
+
+logger = logging.getLogger(__name__)
+
+def load_config(filename):
+    """
+    @param filename A .json or .yaml config file
+    @return The config as a dictionary
+    """
+    with open(filename, 'r') as f:
+        if os.path.splitext(filename)[1] in ['.yaml', '.yml']:
+            import yaml
+            return yaml.safe_load(f)
+        return json.load(f)
+
+def job_key(task, params, seed):
+    """
+    @return A key identifying the job that runs task with params and seed
+    """
+    return hashlib.sha1(json.dumps([task, params, seed], sort_keys=True)).hexdigest()
+
+def expand_config(config):
+    """
+    @param config A config with a list of experiments and a list of seeds
+    @return A list of jobs, one per experiment, combination of grid values
+      and seed. A job is a dictionary with a key, task, params and seed.
+    """
+    default_seeds = config.get('seeds', range(config.get('num_seeds', 1)))
+
+    jobs = []
+    for experiment in config['experiments']:
+        grid = experiment.get('grid', {})
+        names = sorted(grid.keys())
+        seeds = experiment.get('seeds', default_seeds)
+        for values in itertools.product(*[grid[name] for name in names]):
+            params = dict(experiment.get('params', {}))
+            params.update(zip(names, values))
+            for seed in seeds:
+                jobs.append({'key': job_key(experiment['task'], params, seed),
+                             'task': experiment['task'],
+                             'params': params,
+                             'seed': seed})
+    return jobs
+
+class ResultStore(object):
+
+    def __init__(self, filename):
+        """
+        @param filename The sqlite database to store results in
+        """
+        self.conn = sqlite3.connect(filename)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS results ('
+                          'key TEXT PRIMARY KEY, task TEXT, params TEXT, seed INTEGER, '
+                          'status TEXT, metrics TEXT, error TEXT, wall_time REAL, finished REAL)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS results_task ON results (task, status)')
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def completed_keys(self):
+        """
+        @return The keys of every job that finished successfully
+        """
+        rows = self.conn.execute("SELECT key FROM results WHERE status = 'done'")
+        return set(row[0] for row in rows)
+
+    def record(self, job, status, metrics, error, wall_time):
+        """
+        Store the outcome of a job, replacing any earlier attempt
+        """
+        self.conn.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                          (job['key'], job['task'], json.dumps(job['params'], sort_keys=True),
+                           job['seed'], status, json.dumps(metrics), error, wall_time,
+                           time.time()))
+        self.conn.commit()
+
+    def results(self, task=None, status='done'):
+        """
+        @return A generator of result dictionaries with the task, params,
+          seed, status, metrics, error and wall_time of every stored job
+        """
+        query = 'SELECT task, params, seed, status, metrics, error, wall_time FROM results WHERE status = ?'
+        values = [status]
+        if task is not None:
+            query += ' AND task = ?'
+            values.append(task)
+        for row in self.conn.execute(query, values):
+            yield {'task': row[0],
+                   'params': json.loads(row[1]),
+                   'seed': row[2],
+                   'status': row[3],
+                   'metrics': json.loads(row[4]) if row[4] else None,
+                   'error': row[5],
+                   'wall_time': row[6]}
+
+def run_job(job):
+    """
+    Run a single job. This is a module level function so it can be
+    dispatched through a process pool.
+    @return A tuple (job, status, metrics, error, wall_time), status is done or failed
+    """
+    import tasks
+
+    start = timeit.default_timer()
+    try:
+        metrics = tasks.TASKS[job['task']](job['params'], job['seed'])
+        status, error = 'done', None
+    except Exception:
+        metrics, status, error = None, 'failed', traceback.format_exc()
+    return job, status, metrics, error, timeit.default_timer() - start
+
+def run_jobs(jobs, store, processes=None):
+    """
+    Run every job that has not finished yet, storing each result as
+    soon as it completes
+    @param processes The number of processes, 1 runs every job in this process
+    @return The number of jobs that failed
+    """
+    completed = store.completed_keys()
+    pending = [job for job in jobs if job['key'] not in completed]
+    logger.info('%d jobs, %d already done, running %d',
+                len(jobs), len(jobs) - len(pending), len(pending))
+    if not pending:
+        return 0
+
+    pool = None
+    if processes == 1:
+        outcomes = itertools.imap(run_job, pending)
+    else:
+        import multiprocessing
+        pool = multiprocessing.Pool(processes)
+        outcomes = pool.imap_unordered(run_job, pending)
+
+    num_failed = 0
+    try:
+        for idx, (job, status, metrics, error, wall_time) in enumerate(outcomes):
+            store.record(job, status, metrics, error, wall_time)
+            if status != 'done':
+                num_failed += 1
+                logger.error('%s %s seed=%d failed:\n%s',
+                             job['task'], json.dumps(job['params'], sort_keys=True),
+                             job['seed'], error)
+            logger.info('[%d/%d] %s %s seed=%d: %s (%0.1fs)', idx + 1, len(pending),
+                        job['task'], json.dumps(job['params'], sort_keys=True),
+                        job['seed'], status, wall_time)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    return num_failed
+
+def summarize(results):
+    """
+    @param results Result dictionaries from ResultStore.results
+    @return A list of (task, params, num_seeds, mean metrics) with one entry
+      per task and params, averaged over seeds
+    """
+    groups = {}
+    for result in results:
+        key = (result['task'], json.dumps(result['params'], sort_keys=True))
+        groups.setdefault(key, []).append(result['metrics'])
+
+    summary = []
+    for (task, params), metrics in sorted(groups.items()):
+        names = sorted(set(name for m in metrics for name in m.keys()))
+        means = {}
+        for name in names:
+            values = [m[name] for m in metrics
+                      if isinstance(m.get(name), (int, long, float))]
+            if values:
+                means[name] = sum(values) / float(len(values))
+        summary.append((task, json.loads(params), len(metrics), means))
+    return summary
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Run a sweep of experiments")
+    parser.add_argument("config",
+                        help="The .json or .yaml file describing the sweep")
+    parser.add_argument("--store", type=str, default=None,
+                        help="The sqlite file to store results in, overrides the store in the config")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="The number of processes to run jobs in, defaults to the number of cores")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="List the jobs that would run without running them")
+    parser.add_argument("--summary", action="store_true",
+                        help="Print the mean metrics of every finished cell instead of running")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    config = load_config(args.config)
+    # A store named on the command line is used as given, one named in the
+    # config is relative to the config file
+    store_file = args.store
+    if store_file is None:
+        store_file = config.get('store') or os.path.splitext(os.path.basename(args.config))[0] + '.db'
+        if not os.path.isabs(store_file):
+            store_file = os.path.join(os.path.dirname(os.path.abspath(args.config)), store_file)
+
+    jobs = expand_config(config)
+    store = ResultStore(store_file)
+
+    if args.dry_run:
+        completed = store.completed_keys()
+        for job in jobs:
+            print '%s %s seed=%d%s' % (job['task'], json.dumps(job['params'], sort_keys=True),
+                                       job['seed'], ' (done)' if job['key'] in completed else '')
+        exit(0)
+
+    if args.summary:
+        for task, params, num_seeds, means in summarize(store.results()):
+            print '%s %s (%d seeds)' % (task, json.dumps(params, sort_keys=True), num_seeds)
+            for name in sorted(means.keys()):
+                print '\t%s: %g' % (name, means[name])
+        exit(0)
+
+    num_failed = run_jobs(jobs, store, processes=args.processes)
+    store.close()
+    exit(1 if num_failed else 0)
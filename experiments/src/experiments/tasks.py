@@ -0,0 +1,162 @@
+"""
+The experiments the runner can execute. A task is a function taking a
+dictionary of parameters and a seed and returning a dictionary of scalar
+metrics. Tasks import the packages of this repository from their source
+directories, which are added to sys.path on import.
+"""
+import argparse, os, random, sys, timeit
+import numpy
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+PACKAGE_DIRS = [os.path.join(ROOT, 'bandit_selection', 'src', 'bandit_selection'),
+                os.path.join(ROOT, 'bandit_selection', 'src', 'bandit_selection', 'old'),
+                os.path.join(ROOT, 'hoo', 'src', 'hoo'),
+                os.path.join(ROOT, 'pomcp', 'src', 'pomcp')]
+for package_dir in PACKAGE_DIRS:
+    if package_dir not in sys.path:
+        sys.path.append(package_dir)
+
+def _seed(seed):
+    random.seed(seed)
+    numpy.random.seed(seed)
+
+def bandit(params, seed):
+    """
+    Select the best of a set of Bernoulli arms
+    @param params algo (equal, ucbe, sr or lucb), num_arms, budget,
+      arm_dist, a (UCB-E), delta (LUCB) and confidence
+    """
+    from distributions.binomial import BinomialArmSet, draw_pvals
+    from algorithms.equal_allocation import EqualAllocation
+    from algorithms.successive_rejects import SuccessiveRejects
+    from algorithms.ucb_e import UCB_E
+    from algorithms.lucb import LUCB
+
+    _seed(seed)
+    pvals = draw_pvals(params.get('arm_dist', 'uniform'), params['num_arms'])
+    arms = BinomialArmSet(pvals)
+    budget = params.get('budget', 1000)
+
+    name = params['algo']
+    if name == 'equal':
+        algo = EqualAllocation(arms, budget)
+    elif name == 'ucbe':
+        algo = UCB_E(arms, budget, a = params.get('a', 50))
+    elif name == 'sr':
+        algo = SuccessiveRejects(arms, budget)
+    elif name == 'lucb':
+        algo = LUCB(arms, budget, delta = params.get('delta', 0.05))
+    else:
+        raise ValueError('Unknown algorithm: %s' % name)
+
+    start = timeit.default_timer()
+    selected = algo.solve(confidence = params.get('confidence'))
+    wall_time = timeit.default_timer() - start
+
+    return {'correct': int(pvals[selected] == pvals.max()),
+            'regret': float(pvals.max() - pvals[selected]),
+            'num_pulls': int(algo.num_pulls),
+            'confidence': float(algo.confidence()),
+            'wall_time': wall_time}
+
+# The benchmark options of hoo used when a parameter is not given
+HOO_DEFAULTS = {'noise': 0.,
+                'hoo_row': 0.25,
+                'hoo_v1': 0.25,
+                'mf_bias': 0.05,
+                'mf_cost': 0.1,
+                'ucb_bins': 10}
+
+def hoo(params, seed):
+    """
+    Optimize a test function with one of the hoo action selection algorithms
+    @param params algo (hoo, mfhoo, ucb1 or gps), function, dim, horizon and
+      any of the options in HOO_DEFAULTS
+    """
+    import benchmark
+
+    options = dict(HOO_DEFAULTS)
+    options.update((k, v) for k, v in params.items() if k in HOO_DEFAULTS)
+    rows = benchmark.run_case(params['algo'], params.get('function', 'multimodal'),
+                              params.get('dim', 2), seed, [params.get('horizon', 1000)],
+                              argparse.Namespace(**options))
+    if not rows:
+        raise ValueError('%s does not support %s' % (params['algo'], params.get('function')))
+
+    return {k: v for k, v in rows[-1].items()
+            if k not in ['algorithm', 'function', 'dim', 'seed', 'horizon']}
+
+def pomcp(params, seed):
+    """
+    Plan a path to a goal with POMCP from the example problem
+    @param params method (ucb1 or gps), c, num_bins, iterations,
+      belief_size, gamma, epsilon, num_paths and belief, a .npz initial belief
+    """
+    import problem
+    from pomcp import POMCP, load_belief
+
+    _seed(seed)
+    if params.get('method', 'ucb1') == 'ucb1':
+        from action import UCB1
+        action = UCB1(0., 2.*numpy.pi, params.get('num_bins', 4), params.get('c', 0.))
+    else:
+        from action import GPS
+        action = GPS(0., 2.*numpy.pi)
+
+    p = POMCP(problem.get_initial_state, problem.reward, problem.execute_action,
+              action.get_action, params.get('belief_size', 20),
+              params.get('gamma', 0.95), params.get('epsilon', 0.5))
+
+    start = numpy.array([0., 0.])
+    goal = numpy.array([5., 5.])
+    initial_belief = None
+    if params.get('belief'):
+        initial_belief = load_belief(params['belief'], num_fields=len(start))
+
+    begin = timeit.default_timer()
+    p.run(start, goal, max_iterations=params.get('iterations', 20),
+          initial_belief=initial_belief)
+    wall_time = timeit.default_timer() - begin
+
+    cov = numpy.array([[0.1, 0.], [0., 0.1]])
+    distances = []
+    lengths = []
+    for _ in xrange(params.get('num_paths', 20)):
+        path = p.extract_path(problem.get_initial_state(start, cov))
+        distances.append(numpy.linalg.norm(path[-1] - goal))
+        lengths.append(len(path) - 1)
+
+    return {'goal_distance': float(numpy.mean(distances)),
+            'path_length': float(numpy.mean(lengths)),
+            'wall_time': wall_time}
+
+def old_trial(params, seed):
+    """
+    Replay a single trial of the old evaluators on recorded rollouts
+    @param params infile, ground and evaluators (ex: [30fixed, 50bandit])
+    @return The success probability of the last trajectory each evaluator
+      reported and the rollouts it used, keyed by evaluator name
+    """
+    import run_trial
+
+    results = run_trial.run_trials(params['infile'], params['evaluators'], 1,
+                                   seed=seed, processes=1)
+    traj_ids, rollouts = run_trial.load_traj_matrix([params['infile']])
+    ground_truth = run_trial.load_ground_truth([params['ground']])
+    evaluators = run_trial.parse_evalutors(params['evaluators'])
+
+    metrics = {}
+    for eidx, ev in enumerate(evaluators):
+        rows = numpy.flatnonzero(results['evaluator'] == eidx)
+        if len(rows) == 0:
+            continue
+        last = rows[-1]
+        metrics['%s_p_act' % ev.name] = ground_truth[traj_ids[results['traj'][last]]]
+        metrics['%s_p_est' % ev.name] = float(results['p_est'][last])
+        metrics['%s_rollouts' % ev.name] = int(results['num_rollouts'][last])
+    return metrics
+
+TASKS = {'bandit': bandit,
+         'hoo': hoo,
+         'pomcp': pomcp,
+         'old_trial': old_trial}
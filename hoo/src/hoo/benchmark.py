@@ -0,0 +1,361 @@
+#!/usr/bin/env python
+"""
+Benchmark harness for the action selection algorithms in this package.
+
+Every (algorithm, test function, seed) case is run once up to the largest
+requested horizon. A result row is recorded each time the run passes one of
+the requested horizons, so a single run of 10^6 rounds also reports 10^2,
+10^3, ... rounds.
+
+Example:
+  ./benchmark.py --functions multimodal branin --horizons 100 1000 10000 \
+      --seeds 0 1 2 --outfile base.json
+  ./benchmark.py --compare base.json new.json
+"""
+import argparse, csv, json, logging, math, random, resource, timeit
+import numpy
+from hoo import Range
+
+logger = logging.getLogger(__name__)
+
+class Box(Range):
+    """
+    An axis aligned box in d dimensions. Splits cut the widest side in half.
+    """
+    def __init__(self, min_vals, max_vals):
+        self.min_vals = numpy.array(min_vals, dtype=float)
+        self.max_vals = numpy.array(max_vals, dtype=float)
+
+    def __str__(self):
+        return '%s->%s' % (self.min_vals, self.max_vals)
+
+    def split(self):
+        d = numpy.argmax(self.max_vals - self.min_vals)
+        mid = self.min_vals[d] + 0.5*(self.max_vals[d] - self.min_vals[d])
+        max1 = self.max_vals.copy()
+        max1[d] = mid
+        min2 = self.min_vals.copy()
+        min2[d] = mid
+        return Box(self.min_vals, max1), Box(min2, self.max_vals)
+
+    def select_random(self):
+        return numpy.random.uniform(self.min_vals, self.max_vals)
+
+    def get_bins(self, num_bins):
+        bins = [self]
+        while len(bins) < num_bins:
+            R1, R2 = bins.pop(0).split()
+            bins += [R1, R2]
+        return bins
+
+class TestFunction(object):
+    """
+    A reward function to maximize with a known optimum value
+    """
+    def __init__(self, name, func, R, dim, optimum):
+        """
+        @param name The name of the function
+        @param func A function mapping a point in R to a reward
+        @param R The range to search
+        @param dim The dimension of the search space
+        @param optimum The maximum value of func on R
+        """
+        self.name = name
+        self.func = func
+        self.R = R
+        self.dim = dim
+        self.optimum = optimum
+
+def multimodal(x):
+    """
+    The 1-D multimodal function used to illustrate HOO
+    """
+    return 0.5*(numpy.sin(13.*x)*numpy.sin(27.*x) + 1.)
+
+def branin(x):
+    """
+    Negative of the Branin function (maximum -0.397887)
+    """
+    a, b, c = 1., 5.1/(4.*numpy.pi**2), 5./numpy.pi
+    r, s, t = 6., 10., 1./(8.*numpy.pi)
+    x1, x2 = x[0], x[1]
+    return -(a*(x2 - b*x1**2 + c*x1 - r)**2 + s*(1. - t)*numpy.cos(x1) + s)
+
+def rastrigin(x):
+    """
+    Negative of the Rastrigin function (maximum 0 at the origin)
+    """
+    x = numpy.asarray(x)
+    return -(10.*len(x) + numpy.sum(x**2 - 10.*numpy.cos(2.*numpy.pi*x)))
+
+def get_test_function(name, dim=2):
+    """
+    @param name One of multimodal, branin, rastrigin
+    @param dim The dimension, only used by rastrigin
+    @return A TestFunction
+    """
+    if name == 'multimodal':
+        from run_action_selection import SingleDimension
+        xvals = numpy.linspace(0., 1., 1000001)
+        return TestFunction(name, multimodal, SingleDimension(0., 1.), 1,
+                            numpy.max(multimodal(xvals)))
+    elif name == 'branin':
+        return TestFunction(name, branin, Box([-5., 0.], [10., 15.]), 2,
+                            -0.397887357729739)
+    elif name == 'rastrigin':
+        return TestFunction('rastrigin%d' % dim, rastrigin,
+                            Box([-5.12]*dim, [5.12]*dim), dim, 0.)
+    raise ValueError('Unknown test function: %s' % name)
+
+def make_fidelities(rfunc, bias, cost):
+    """
+    Build a cheap, biased fidelity of rfunc for benchmarking MF-HOO
+
+    @param bias The bias bound of the cheap fidelity
+    @param cost The cost of the cheap fidelity (the true function costs 1)
+    @return A list of Fidelity objects
+    """
+    from hoo import Fidelity
+    def low_fidelity(x):
+        return rfunc(x) + bias*numpy.cos(50.*numpy.sum(x))
+    return [Fidelity(low_fidelity, cost, bias), Fidelity(rfunc, 1., 0.)]
+
+def make_algorithm(name, test_func, rfunc, args):
+    """
+    @param name One of hoo, mfhoo, ucb1, gps
+    @return The algorithm, or None if it does not support the test function
+    """
+    if name == 'hoo':
+        from hoo import HOO
+        return HOO(test_func.R, rfunc, args.hoo_row, args.hoo_v1)
+    elif name == 'mfhoo':
+        from hoo import MFHOO
+        return MFHOO(test_func.R, make_fidelities(rfunc, args.mf_bias, args.mf_cost),
+                     args.hoo_row, args.hoo_v1)
+    elif name == 'ucb1':
+        from ucb1 import UCB1
+        return UCB1(test_func.R, rfunc, args.ucb_bins)
+    elif name == 'gps':
+        if test_func.dim != 1:
+            return None
+        from gps import GPS
+        return GPS(test_func.R, rfunc)
+    raise ValueError('Unknown algorithm: %s' % name)
+
+def count_nodes(algo):
+    """
+    @return The number of nodes (cells, bins or points) the algorithm has allocated
+    """
+    if hasattr(algo, 'root'):
+        if algo.root is None:
+            return 0
+        count = 0
+        stack = [algo.root]
+        while stack:
+            node = stack.pop()
+            count += 1
+            if node._children is not None:
+                stack += node._children
+        return count
+    elif hasattr(algo, 'bins'):
+        return len(algo.bins)
+    return 2
+
+def run_case(algo_name, func_name, dim, seed, horizons, args):
+    """
+    Run a single algorithm on a single test function
+
+    @return A list of result rows, one per horizon
+    """
+    random.seed(seed)
+    numpy.random.seed(seed)
+
+    test_func = get_test_function(func_name, dim)
+    noise = args.noise
+    if noise > 0.:
+        rfunc = lambda x: test_func.func(x) + numpy.random.normal(0., noise)
+    else:
+        rfunc = test_func.func
+
+    algo = make_algorithm(algo_name, test_func, rfunc, args)
+    if algo is None:
+        return []
+
+    horizons = sorted(horizons)
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    rows = []
+    cumulative_regret = 0.
+    best_value = -float('inf')
+    elapsed = 0.
+    hidx = 0
+    for n in xrange(horizons[-1]):
+        start = timeit.default_timer()
+        x, _ = algo.run(n)
+        elapsed += timeit.default_timer() - start
+
+        # Regret is measured on the noiseless function
+        value = test_func.func(x)
+        cumulative_regret += test_func.optimum - value
+        best_value = max(best_value, value)
+
+        if n + 1 == horizons[hidx]:
+            peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            rows.append({'algorithm': algo_name,
+                         'function': test_func.name,
+                         'dim': test_func.dim,
+                         'seed': seed,
+                         'horizon': n + 1,
+                         'wall_time': elapsed,
+                         'rounds_per_sec': (n + 1) / elapsed if elapsed > 0 else float('inf'),
+                         'peak_rss_kb': peak_rss,
+                         'rss_growth_kb': peak_rss - base_rss,
+                         'nodes': count_nodes(algo),
+                         'evaluations': getattr(algo, 'num_evals', n + 1),
+                         'cost': getattr(algo, 'total_cost', getattr(algo, 'num_evals', n + 1)),
+                         'cumulative_regret': cumulative_regret,
+                         'simple_regret': test_func.optimum - best_value})
+            logger.info('%s %s seed=%d n=%d: %0.1f rounds/sec, regret %0.3f',
+                        algo_name, test_func.name, seed, n + 1,
+                        rows[-1]['rounds_per_sec'], cumulative_regret)
+            hidx += 1
+
+    return rows
+
+def _run_case_star(case):
+    return run_case(*case)
+
+def run_benchmark(args):
+    """
+    Run every requested case. Each case runs in a fresh worker process
+    so the peak memory reported for it is not polluted by earlier cases.
+    """
+    import multiprocessing
+    cases = [(algo, func, args.dim, seed, args.horizons, args)
+             for func in args.functions
+             for algo in args.algos
+             for seed in args.seeds]
+
+    pool = multiprocessing.Pool(processes=1, maxtasksperchild=1)
+    try:
+        results = pool.map(_run_case_star, cases, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+    return [row for rows in results for row in rows]
+
+FIELDS = ['algorithm', 'function', 'dim', 'seed', 'horizon', 'wall_time',
+          'rounds_per_sec', 'peak_rss_kb', 'rss_growth_kb', 'nodes',
+          'evaluations', 'cost', 'cumulative_regret', 'simple_regret']
+
+def save_results(rows, outfile):
+    """
+    Write results to a .json or .csv file depending on the extension
+    """
+    if outfile.endswith('.json'):
+        with open(outfile, 'w') as f:
+            json.dump(rows, f, indent=1)
+    else:
+        with open(outfile, 'w') as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(row)
+
+def load_results(infile):
+    """
+    Load results written by save_results
+    """
+    with open(infile, 'r') as f:
+        if infile.endswith('.json'):
+            return json.load(f)
+        rows = []
+        for row in csv.DictReader(f):
+            for k in FIELDS[2:]:
+                row[k] = float(row[k])
+            rows.append(row)
+        return rows
+
+def summarize(rows):
+    """
+    @return A dictionary mapping (algorithm, function, horizon) to the
+      mean of every metric across seeds
+    """
+    groups = {}
+    for row in rows:
+        key = (row['algorithm'], row['function'], int(row['horizon']))
+        groups.setdefault(key, []).append(row)
+    return {key: {k: numpy.mean([float(r[k]) for r in group]) for k in FIELDS[5:]}
+            for key, group in groups.items()}
+
+def compare_results(base_rows, new_rows, tolerance=0.1):
+    """
+    Compare two benchmark runs, for example of two revisions of the code
+
+    @param tolerance The allowed relative slowdown in rounds per second
+    @return A list of (key, base rounds/sec, new rounds/sec) for every
+      case that regressed by more than tolerance
+    """
+    base = summarize(base_rows)
+    new = summarize(new_rows)
+    regressions = []
+    for key in sorted(set(base.keys()) & set(new.keys())):
+        b, n = base[key], new[key]
+        ratio = n['rounds_per_sec'] / b['rounds_per_sec']
+        print '%-6s %-12s n=%-8d rounds/sec %10.1f -> %10.1f (x%0.2f)  regret %10.3f -> %10.3f  nodes %8d -> %8d' % (
+            key[0], key[1], key[2], b['rounds_per_sec'], n['rounds_per_sec'], ratio,
+            b['cumulative_regret'], n['cumulative_regret'], b['nodes'], n['nodes'])
+        if ratio < 1. - tolerance:
+            regressions.append((key, b['rounds_per_sec'], n['rounds_per_sec']))
+    return regressions
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Benchmark the action selection algorithms")
+    parser.add_argument("--algos", nargs='+', choices=['hoo', 'mfhoo', 'ucb1', 'gps'],
+                        default=['hoo', 'ucb1', 'gps'],
+                        help="The algorithms to benchmark")
+    parser.add_argument("--functions", nargs='+', choices=['multimodal', 'branin', 'rastrigin'],
+                        default=['multimodal'],
+                        help="The test functions to optimize")
+    parser.add_argument("--dim", type=int, default=2,
+                        help="The dimension of the rastrigin function")
+    parser.add_argument("--horizons", type=int, nargs='+', default=[100, 1000],
+                        help="The number of rounds to report results at (up to 10^6)")
+    parser.add_argument("--seeds", type=int, nargs='+', default=[0],
+                        help="The random seeds to run")
+    parser.add_argument("--noise", type=float, default=0.,
+                        help="Standard deviation of gaussian noise added to every reward")
+    parser.add_argument("--hoo-row", type=float, default=0.25,
+                        help="The row parameter of HOO")
+    parser.add_argument("--hoo-v1", type=float, default=0.25,
+                        help="The v1 parameter of HOO")
+    parser.add_argument("--mf-bias", type=float, default=0.05,
+                        help="The bias of the cheap fidelity used by MF-HOO")
+    parser.add_argument("--mf-cost", type=float, default=0.1,
+                        help="The cost of the cheap fidelity used by MF-HOO")
+    parser.add_argument("--ucb-bins", type=int, default=10,
+                        help="The number of bins used by UCB1")
+    parser.add_argument("--outfile", type=str, default=None,
+                        help="The .csv or .json file to write results to")
+    parser.add_argument("--compare", type=str, nargs=2, default=None,
+                        metavar=('BASE', 'NEW'),
+                        help="Compare two result files instead of running the benchmark")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="The relative slowdown allowed when comparing results")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.compare is not None:
+        regressions = compare_results(load_results(args.compare[0]),
+                                      load_results(args.compare[1]),
+                                      tolerance=args.tolerance)
+        for key, b, n in regressions:
+            print 'REGRESSION %s %s n=%d: %0.1f -> %0.1f rounds/sec' % (key[0], key[1], key[2], b, n)
+        exit(1 if regressions else 0)
+
+    rows = run_benchmark(args)
+    if args.outfile is not None:
+        save_results(rows, args.outfile)
+        print 'Saved %d results to %s' % (len(rows), args.outfile)
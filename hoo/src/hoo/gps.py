@@ -2,23 +2,95 @@
 
 class GPS(object):
 
-    def __init__(self, R, rfunc):
+    def __init__(self, R, rfunc, num_samples=1, resample=False,
+                 restart_width=None, restart_shrink=0.5):
+        """
+        @param R The range to search
+        @param rfunc The reward function
+        @param num_samples The number of evaluations averaged for every new point
+        @param resample If true, the point that survives a step is evaluated
+          again on the next step and its running average updated
+        @param restart_width If not None, restart the search once the two points
+          are closer than this
+        @param restart_shrink The width of the bracket a restart searches, as a
+          fraction of the previous bracket, centered on the best point
+        """
         import numpy
         self.phi = (numpy.sqrt(5) - 1.)/2.
-        self.a = self.phi*R.min_val + (1. - self.phi)*R.max_val
-        self.b = (1. - self.phi)*R.min_val + self.phi*R.max_val
+        self.R = R
         self.rfunc = rfunc
+        self.num_samples = num_samples
+        self.resample = resample
+        self.restart_width = restart_width
+        self.restart_shrink = restart_shrink
+        self.num_evals = 0
+        self._last_node = None
+        self._num_steps = 0
+        self._set_bracket(R.min_val, R.max_val)
 
     def __str__(self):
         return 'GPS'
 
+    def get_last_node(self):
+        """
+        @return The (point, step) of the point returned in the last round,
+          point is 0 for a and 1 for b
+        """
+        return self._last_node
+
+    def _set_bracket(self, lo, hi):
+        """
+        Place two fresh points inside the bracket [lo, hi]
+        """
+        self.width = hi - lo
+        self.a = self.phi*lo + (1. - self.phi)*hi
+        self.b = (1. - self.phi)*lo + self.phi*hi
+        # (sum, count) of the evaluations of each point, None if not evaluated
+        self._astats = None
+        self._bstats = None
+
+    def _evaluate(self, x, stats, num_samples):
+        """
+        @return The stats of x updated with num_samples new evaluations
+        """
+        total, count = stats if stats is not None else (0., 0)
+        for _ in xrange(num_samples):
+            total += self.rfunc(x)
+        self.num_evals += num_samples
+        return total, count + num_samples
+
     def run(self, n):
-        
-        aval = self.rfunc(self.a)
-        bval = self.rfunc(self.b)
+
+        # Only a point moved by the last step needs to be evaluated,
+        # the value of the surviving point is reused
+        if self._astats is None:
+            self._astats = self._evaluate(self.a, None, self.num_samples)
+        elif self.resample:
+            self._astats = self._evaluate(self.a, self._astats, 1)
+        if self._bstats is None:
+            self._bstats = self._evaluate(self.b, None, self.num_samples)
+        elif self.resample:
+            self._bstats = self._evaluate(self.b, self._bstats, 1)
+
+        aval = self._astats[0] / self._astats[1]
+        bval = self._bstats[0] / self._bstats[1]
+        self._num_steps += 1
         if aval > bval:
+            # The bracket shrinks to the side of a, b moves past a
             self.b = (1. + self.phi)*self.a - self.phi*self.b
-            return self.a, aval
+            self._bstats = None
+            x, val = self.a, aval
+            self._last_node = (0, self._num_steps)
         else:
             self.a = (1. + self.phi)*self.b - self.phi*self.a
-            return self.b, bval
+            self._astats = None
+            x, val = self.b, bval
+            self._last_node = (1, self._num_steps)
+
+        if self.restart_width is not None and abs(self.a - self.b) < self.restart_width:
+            # Restart on a smaller bracket centered on the best point
+            half_width = 0.5*self.restart_shrink*self.width
+            self._set_bracket(max(self.R.min_val, x - half_width),
+                              min(self.R.max_val, x + half_width))
+
+        return x, val
@@ -23,7 +23,7 @@ class HOONode(object):
         self.h = h
         self.i = i
         self.N = 0
-        self.Y = list()
+        self.Ysum = 0.
         
         self.R = R        
         self._children=None
@@ -39,7 +39,7 @@ class HOONode(object):
 
         if self.N == 0:
             return float('inf')
-        U = numpy.mean(self.Y) + numpy.sqrt(2.*numpy.log(n)/self.N) + v1*pow(row,self.h)
+        U = self.Ysum/self.N + numpy.sqrt(2.*numpy.log(n)/self.N) + v1*pow(row,self.h)
         Bchild = max([c.getBVal(n, row, v1) for c in self.getChildren()])
         return min(U, Bchild)
 
@@ -57,10 +57,19 @@ class HOO(object):
         self.rfunc = rfunc
         self.row = row
         self.v1 = v1
+        self.last_node = None
+        self.num_evals = 0
+        self.total_cost = 0.
 
     def __str__(self):
         return 'HOO'
 
+    def get_last_node(self):
+        """
+        @return The (index, depth) of the node sampled in the last round
+        """
+        return self.last_node.i, self.last_node.h
+
     def run(self, n):
         """
         @param n The round
@@ -72,18 +81,94 @@ class HOO(object):
     def _recursive_search(self, node, n):
         if node.N == 0:
             x = node.R.select_random()
-            y = self.rfunc(x)
+            y = self._evaluate(x, node)
             node.N = 1
-            node.Y = [y]
+            node.Ysum = y
+            self.last_node = node
             return x, y
 
         children = node.getChildren()        
-        idx,val = max(enumerate([c.getBVal(n, self.row, self.v1) for c in children]), 
+        idx,val = max(enumerate([self._getBVal(c, n) for c in children]), 
                       key=lambda v: v[1])
         x, y = self._recursive_search(children[idx], n)
 
         # Update the node parameters
         node.N += 1
-        node.Y += [ y ]
+        node.Ysum += y
 
         return x, y
+
+    def _getBVal(self, node, n):
+        """
+        @return The B value of node in round n
+        """
+        return node.getBVal(n, self.row, self.v1)
+
+    def _evaluate(self, x, node):
+        """
+        @param x The point to evaluate
+        @param node The leaf x was sampled from
+        @return The reward at x
+        """
+        self.num_evals += 1
+        self.total_cost += 1.
+        return self.rfunc(x)
+
+class Fidelity(object):
+
+    def __init__(self, rfunc, cost, bias):
+        """
+        @param rfunc The reward function at this fidelity
+        @param cost The cost of a single evaluation of rfunc
+        @param bias A bound on the difference between rfunc and the
+          highest fidelity reward function
+        """
+        self.rfunc = rfunc
+        self.cost = cost
+        self.bias = bias
+
+class MFHOO(HOO):
+
+    def __init__(self, R, fidelities, row, v1):
+        """
+        HOO over a reward function that can be evaluated at several fidelities.
+        A leaf at depth h is evaluated with the cheapest fidelity whose bias is
+        below the smoothness term v1*row^h, so shallow cells use cheap
+        evaluations and the bias never dominates the size of a cell.
+
+        @param R The range to search
+        @param fidelities A list of Fidelity objects
+        @param row The row parameter of HOO
+        @param v1 The v1 parameter of HOO
+        """
+        HOO.__init__(self, R, None, row, v1)
+        self.fidelities = sorted(fidelities, key=lambda f: f.cost)
+        self.fidelity_evals = [0 for _ in self.fidelities]
+
+    def __str__(self):
+        return 'MF-HOO'
+
+    def select_fidelity(self, h):
+        """
+        @param h The depth of the leaf being evaluated
+        @return The index of the fidelity to evaluate with
+        """
+        threshold = self.v1*pow(self.row, h)
+        for idx, f in enumerate(self.fidelities):
+            if f.bias <= threshold:
+                return idx
+        # Nothing is accurate enough, use the least biased fidelity
+        return min(range(len(self.fidelities)), key=lambda idx: self.fidelities[idx].bias)
+
+    def _getBVal(self, node, n):
+        # Rewards in a cell at depth h carry bias up to v1*row^h on top
+        # of the smoothness term, so the optimistic bound doubles it
+        return node.getBVal(n, self.row, 2.*self.v1)
+
+    def _evaluate(self, x, node):
+        idx = self.select_fidelity(node.h)
+        fidelity = self.fidelities[idx]
+        self.num_evals += 1
+        self.fidelity_evals[idx] += 1
+        self.total_cost += fidelity.cost
+        return fidelity.rfunc(x)
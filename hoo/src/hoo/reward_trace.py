@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+"""
+Streaming reward traces for long action selection runs.
+
+A trace file is a 16 byte header followed by fixed size binary records
+(round, x, y, node, depth). Records are buffered in a fixed size array and
+appended to the file a chunk at a time, so writing a trace uses constant
+memory. The analysis functions read the file back through a memory map one
+chunk at a time.
+"""
+import os, numpy
+
+_MAGIC = 'HOOTRACE'
+_HEADER_SIZE = 16
+
+def trace_dtype(dim=1):
+    """
+    @param dim The dimension of the sampled points
+    @return The numpy dtype of a single trace record
+    """
+    xtype = ('x', '<f8') if dim == 1 else ('x', '<f8', (dim,))
+    return numpy.dtype([('round', '<i8'), xtype, ('y', '<f8'),
+                        ('node', '<i8'), ('depth', '<i4')])
+
+class TraceWriter(object):
+
+    def __init__(self, filename, dim=1, buffer_size=65536):
+        """
+        @param filename The file to write the trace to
+        @param dim The dimension of the sampled points
+        @param buffer_size The number of records to buffer before writing
+        """
+        self.filename = filename
+        self.dim = dim
+        self._buffer = numpy.zeros(buffer_size, dtype=trace_dtype(dim))
+        self._count = 0
+
+        self._f = open(filename, 'wb')
+        header = numpy.zeros(2, dtype='<i4')
+        header[0] = 1 # version
+        header[1] = dim
+        self._f.write(_MAGIC)
+        self._f.write(header.tostring())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, n, x, y, node=-1, depth=-1):
+        """
+        @param n The round
+        @param x The sampled point
+        @param y The reward received
+        @param node The id of the node the point was sampled from
+        @param depth The depth of that node
+        """
+        self._buffer[self._count] = (n, x, y, node, depth)
+        self._count += 1
+        if self._count == len(self._buffer):
+            self.flush()
+
+    def flush(self):
+        """
+        Append all buffered records to the file
+        """
+        if self._count > 0:
+            self._buffer[:self._count].tofile(self._f)
+            self._count = 0
+        self._f.flush()
+
+    def close(self):
+        if not self._f.closed:
+            self.flush()
+            self._f.close()
+
+class TraceReader(object):
+
+    def __init__(self, filename):
+        """
+        @param filename A trace file written by TraceWriter
+        """
+        with open(filename, 'rb') as f:
+            header = f.read(_HEADER_SIZE)
+        if header[:len(_MAGIC)] != _MAGIC:
+            raise ValueError('%s is not a trace file' % filename)
+        self.dim = int(numpy.frombuffer(header[len(_MAGIC):], dtype='<i4')[1])
+        self.filename = filename
+        if os.path.getsize(filename) == _HEADER_SIZE:
+            self.records = numpy.zeros(0, dtype=trace_dtype(self.dim))
+        else:
+            self.records = numpy.memmap(filename, dtype=trace_dtype(self.dim), mode='r',
+                                        offset=_HEADER_SIZE)
+
+    def __len__(self):
+        return len(self.records)
+
+    def chunks(self, chunk_size=1000000):
+        """
+        @return A generator of record arrays holding at most chunk_size records
+        """
+        for start in xrange(0, len(self.records), chunk_size):
+            yield numpy.array(self.records[start:start+chunk_size])
+
+def max_reward(reader, chunk_size=1000000):
+    """
+    @return The largest reward in the trace
+    """
+    return max(numpy.max(c['y']) for c in reader.chunks(chunk_size))
+
+def regret_curve(reader, optimum=None, func=None, num_points=1000, chunk_size=1000000):
+    """
+    Compute cumulative and simple regret at num_points evenly spaced rounds,
+    the last of which is the final round
+
+    @param reader A TraceReader
+    @param optimum The optimal reward, defaults to the best reward in the trace
+    @param func If given, the noiseless reward function evaluated on the
+      sampled points instead of using the recorded rewards
+    @return rounds, cumulative_regret, simple_regret arrays, empty if the
+      trace has no records
+    """
+    num_records = len(reader)
+    if num_records == 0:
+        return numpy.zeros(0, dtype=int), numpy.zeros(0), numpy.zeros(0)
+
+    if optimum is None:
+        optimum = max_reward(reader, chunk_size)
+
+    num_points = min(num_points, num_records)
+    checkpoints = numpy.unique(numpy.ceil(numpy.linspace(num_records / float(num_points), num_records,
+                                                         num_points)).astype(int)) - 1
+    cumulative = numpy.zeros(len(checkpoints))
+    simple = numpy.zeros(len(checkpoints))
+
+    total = 0.
+    best = -float('inf')
+    start = 0
+    for chunk in reader.chunks(chunk_size):
+        if func is not None:
+            values = numpy.array([func(x) for x in chunk['x']])
+        else:
+            values = chunk['y']
+        regret = numpy.cumsum(optimum - values) + total
+        best_so_far = numpy.maximum.accumulate(numpy.maximum(values, best))
+
+        end = start + len(chunk)
+        mask = (checkpoints >= start) & (checkpoints < end)
+        cumulative[mask] = regret[checkpoints[mask] - start]
+        simple[mask] = optimum - best_so_far[checkpoints[mask] - start]
+
+        total = regret[-1]
+        best = best_so_far[-1]
+        start = end
+
+    return checkpoints + 1, cumulative, simple
+
+def visit_histogram(reader, bins=100, value_range=None, chunk_size=1000000):
+    """
+    Histogram the sampled points and the depth of the nodes they were sampled from
+
+    @param bins The number of bins (per dimension)
+    @param value_range A list of (min, max) per dimension, defaults to the
+      extent of the sampled points
+    @return counts, edges, depth_counts
+    """
+    if value_range is None:
+        lo = numpy.full(reader.dim, numpy.inf)
+        hi = numpy.full(reader.dim, -numpy.inf)
+        for chunk in reader.chunks(chunk_size):
+            x = chunk['x'].reshape(len(chunk), reader.dim)
+            lo = numpy.minimum(lo, x.min(axis=0))
+            hi = numpy.maximum(hi, x.max(axis=0))
+        value_range = zip(lo, hi)
+
+    counts = None
+    depth_counts = numpy.zeros(0, dtype=int)
+    for chunk in reader.chunks(chunk_size):
+        x = chunk['x'].reshape(len(chunk), reader.dim)
+        c, edges = numpy.histogramdd(x, bins=bins, range=value_range)
+        counts = c if counts is None else counts + c
+
+        depths = numpy.bincount(numpy.maximum(chunk['depth'], 0))
+        if len(depths) > len(depth_counts):
+            depths[:len(depth_counts)] += depth_counts
+            depth_counts = depths
+        else:
+            depth_counts[:len(depths)] += depths
+
+    if counts is None:
+        return numpy.zeros(bins), None, depth_counts
+    if reader.dim == 1:
+        return counts, edges[0], depth_counts
+    return counts, edges, depth_counts
+
+if __name__ == '__main__':
+
+    import argparse
+    parser = argparse.ArgumentParser(description="Summarize a reward trace")
+    parser.add_argument("trace", type=str,
+                        help="The trace file to analyze")
+    parser.add_argument("--optimum", type=float, default=None,
+                        help="The optimal reward, defaults to the best reward in the trace")
+    parser.add_argument("--num-points", type=int, default=10,
+                        help="The number of points on the regret curve to print")
+    parser.add_argument("--bins", type=int, default=10,
+                        help="The number of histogram bins per dimension")
+    args = parser.parse_args()
+
+    reader = TraceReader(args.trace)
+    print '%s: %d rounds, dimension %d' % (args.trace, len(reader), reader.dim)
+
+    rounds, cumulative, simple = regret_curve(reader, optimum=args.optimum,
+                                              num_points=args.num_points)
+    for n, c, s in zip(rounds, cumulative, simple):
+        print '%10d: cumulative regret %0.3f, simple regret %0.5f' % (n, c, s)
+
+    counts, edges, depth_counts = visit_histogram(reader, bins=args.bins)
+    if reader.dim == 1:
+        for idx in range(len(counts)):
+            print '[%0.3f, %0.3f): %d' % (edges[idx], edges[idx+1], counts[idx])
+    for depth, count in enumerate(depth_counts):
+        print 'depth %d: %d' % (depth, count)
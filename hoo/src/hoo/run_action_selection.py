@@ -87,13 +87,51 @@ def visualize(xpoints, R, title=None):
 
     plt.show()
 
+def visualize_trace(trace_file, R, title=None, num_bins=100):
+    """
+    Plot a histogram of the points sampled in a trace written by run_action_selection
+    @param trace_file The trace file
+    @param R The range that was searched
+    @param num_bins The number of histogram bins
+    """
+    import matplotlib.pyplot as plt
+    import numpy
+    from reward_trace import TraceReader, visit_histogram
+
+    # Function value
+    xvals = numpy.arange(0., 1., 0.005)
+    rvals = [ rfunc(x) for x in xvals]
+    plt.fill_between(xvals, 0, rvals, facecolor='gray', lw=0,  alpha=0.2)
+
+    # Visit counts, scaled to the height of the function
+    counts, edges, _ = visit_histogram(TraceReader(trace_file), bins=num_bins,
+                                       value_range=[(R.min_val, R.max_val)])
+    heights = max(rvals) * counts / max(1., counts.max())
+    plt.bar(edges[:-1], heights, width=edges[1:] - edges[:-1], align='edge',
+            color='gray', alpha=0.5)
+
+    if title is not None:
+        plt.title(title)
+    plt.ylim([0., max(rvals)+0.1])
+
+    plt.show()
+
 if __name__ == '__main__':
 
-    import math
+    import argparse, os
     from hoo import HOO
     from ucb1 import UCB1
     from gps import GPS
 
+    parser = argparse.ArgumentParser(description="Compare action selection algorithms on a 1-D function")
+    parser.add_argument("--rounds", type=int, default=300,
+                        help="The number of rounds to run each algorithm")
+    parser.add_argument("--trace-dir", type=str, default=None,
+                        help="Stream every sample to a trace file in this directory instead of keeping them in memory")
+    parser.add_argument("--no-plot", action="store_true",
+                        help="Do not plot the sampled points")
+    args = parser.parse_args()
+
     R = SingleDimension(0., 1.)
     alpha = 2.
     row = pow(2., -alpha)
@@ -105,15 +143,37 @@ if __name__ == '__main__':
 
     algos = [hoo, ucb, gps]
 
+    if args.trace_dir is not None and not os.path.exists(args.trace_dir):
+        os.makedirs(args.trace_dir)
+
     for idx, a in enumerate(algos):
         reward = 0
+
+        if args.trace_dir is not None:
+            from reward_trace import TraceWriter, TraceReader, regret_curve
+            trace_file = os.path.join(args.trace_dir, '%s.trace' % str(a))
+            with TraceWriter(trace_file) as writer:
+                for n in xrange(args.rounds):
+                    x, r = a.run(n)
+                    reward += r
+                    node, depth = a.get_last_node()
+                    writer.write(n, x, r, node, depth)
+
+            print '%s Total Reward: %0.3f' % (str(a), reward)
+            _, cumulative, simple = regret_curve(TraceReader(trace_file),
+                                                 optimum=rfunc(0.5), num_points=1)
+            print '%s Regret: cumulative %0.3f, simple %0.5f (trace: %s)' % (
+                str(a), cumulative[-1], simple[-1], trace_file)
+            if not args.no_plot:
+                visualize_trace(trace_file, R, title=str(a))
+            continue
+
         xvals = []
-        for n in range(300):
+        for n in range(args.rounds):
             x, r = a.run(n)
             reward += r
             xvals += [x]
 
         print '%s Total Reward: %0.3f' % (str(a), reward)
-        visualize(xvals, R, title=str(a))
-        
-    
+        if not args.no_plot:
+            visualize(xvals, R, title=str(a))
@@ -1,41 +1,53 @@
 #!/usr/bin/env python
-
-class UCBNode(object):
-    def __init__(self, R):
-        self.N = 0
-        self.Y = list()
-        self.R = R
-
-    def getUCBVal(self, n):
-        """
-        @param n The current round
-        """
-        if self.N == 0:
-            return float('inf')
-        
-        import numpy
-        return numpy.mean(self.Y) + numpy.sqrt(2*numpy.log(n)/self.N)
+import math, numpy
 
 class UCB1(object):
 
     def __init__(self, R, rfunc, num_bins):
+        """
+        @param R The range to select from
+        @param rfunc The reward function
+        @param num_bins The number of bins to split R into
+        """
         self.R = R
         self.rfunc = rfunc
-        bins = R.get_bins(num_bins)
-        self.nodes = [UCBNode(b) for b in bins]
+        self.bins = R.get_bins(num_bins)
+
+        # Per-bin statistics, updated in O(1) for the pulled bin so every
+        # round only needs a single multiply-add and argmax over all bins
+        self.N = numpy.zeros(len(self.bins))
+        self.sums = numpy.zeros(len(self.bins))
+        self._means = numpy.zeros(len(self.bins))
+        self._inv_sqrt_N = numpy.zeros(len(self.bins))
+        self._vals = numpy.zeros(len(self.bins))
+        self._num_unvisited = len(self.bins)
+        self._last_idx = None
 
     def __str__(self):
         return 'UCB1'
 
+    def get_last_node(self):
+        """
+        @return The (index, depth) of the bin sampled in the last round
+        """
+        return self._last_idx, 0
+
     def run(self, n):
-        idx, val = max(enumerate([node.getUCBVal(n) for node in self.nodes]),
-                       key=lambda v: v[1])
-        b = self.nodes[idx]
-        x = b.R.select_random()
+        if self._num_unvisited > 0:
+            # Unvisited bins have infinite value, take them in order
+            idx = len(self.bins) - self._num_unvisited
+            self._num_unvisited -= 1
+        else:
+            vals = numpy.multiply(self._inv_sqrt_N, math.sqrt(2*math.log(n)), out=self._vals)
+            vals += self._means
+            idx = vals.argmax()
+        x = self.bins[idx].select_random()
         y = self.rfunc(x)
-        
-        b.N += 1
-        b.Y += [y]
+        self._last_idx = idx
+
+        self.N[idx] += 1
+        self.sums[idx] += y
+        self._means[idx] = self.sums[idx] / self.N[idx]
+        self._inv_sqrt_N[idx] = 1. / math.sqrt(self.N[idx])
 
         return x, y
-        
@@ -6,6 +6,21 @@ ch = logging.StreamHandler()
 ch.setLevel(logging.INFO)
 logger.addHandler(ch)
 
+def load_belief(filename, num_fields=None):
+    """
+    @param filename A .npz file written by break_belief.py --npz
+    @param num_fields If not None, the number of values in a state of the
+      problem, checked against the fields in the file
+    @return A list with a state array for every row of the states matrix
+    """
+    with numpy.load(filename) as data:
+        states = data['states']
+        fields = data['fields']
+    if num_fields is not None and len(fields) != num_fields:
+        raise ValueError('Belief %s has states with fields %s, expected %d values'
+                         % (filename, ', '.join(fields), num_fields))
+    return list(states)
+
 class POMCPNode(object):
     
     def __init__(self, B, name=None):
@@ -97,10 +112,16 @@ class POMCP(object):
 
         self.root = None
 
-    def run(self, start, goal, max_iterations=10):
-        
-        cov = numpy.array([[0.1, 0.], [0., 0.1]])
-        B = [self.init_fn(start, cov) for _ in range(self.belief_size)]
+    def run(self, start, goal, max_iterations=10, initial_belief=None):
+        """
+        @param initial_belief A list of states to use as the belief of the
+          root, ex: from load_belief. If None, the belief is sampled around start.
+        """
+        if initial_belief is not None:
+            B = list(initial_belief)
+        else:
+            cov = numpy.array([[0.1, 0.], [0., 0.1]])
+            B = [self.init_fn(start, cov) for _ in range(self.belief_size)]
         self.root = POMCPNode(B, 'root')
 
         for idx in range(max_iterations):
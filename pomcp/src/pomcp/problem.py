@@ -42,6 +42,8 @@ if __name__ == '__main__':
                         help="The number of times to iterate through tree building")
     parser.add_argument("--visualize", action="store_true",
                         help="Visualize the tree")
+    parser.add_argument("--belief", type=str, default=None,
+                        help="A .npz belief from break_belief.py to start from")
 
     args = parser.parse_args()
 
@@ -52,14 +54,18 @@ if __name__ == '__main__':
         from action import GPS
         action = GPS(0., 2.*numpy.pi)
 
-    from pomcp import POMCP
+    from pomcp import POMCP, load_belief
     p = POMCP(get_initial_state, reward, execute_action, action.get_action,
               20, 0.95, 0.5)
     
     start = numpy.array([0., 0.])
     goal = numpy.array([5., 5.])
 
-    p.run(start, goal, max_iterations=args.iterations)
+    initial_belief = None
+    if args.belief is not None:
+        initial_belief = load_belief(args.belief, num_fields=len(start))
+        logger.info('Loaded %d states from %s', len(initial_belief), args.belief)
+    p.run(start, goal, max_iterations=args.iterations, initial_belief=initial_belief)
     if args.visualize:
         p.visualize()
 
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+Measure how long it takes a fresh interpreter to import the modules that
+trial workers load, and which heavy dependencies each one pulls in.
+
+Example:
+  ./bench_import_time.py --repeats 10
+  ./bench_import_time.py --fail-on-heavy
+"""
+import argparse, json, os, subprocess, sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# (source directory, module) pairs imported by workers
+MODULES = [('bandit_selection/src/bandit_selection', 'algorithms.successive_rejects'),
+           ('bandit_selection/src/bandit_selection', 'algorithms.vectorized'),
+           ('bandit_selection/src/bandit_selection', 'utils.data_logger'),
+           ('bandit_selection/src/bandit_selection', 'utils.executor'),
+           ('bandit_selection/src/bandit_selection/analyze', 'compare_values'),
+           ('bandit_selection/src/bandit_selection/old', 'run_trial'),
+           ('hoo/src/hoo', 'benchmark'),
+           ('pomcp/src/pomcp', 'pomcp'),
+           ('scripts', 'graph_tools'),
+           ('experiments/src/experiments', 'tasks')]
+
+# Modules that should only be loaded when plotting
+HEAVY = ['matplotlib', 'networkx', 'ss_plotting']
+
+# Run in the child interpreter: time the import and list the heavy modules loaded
+_CHILD = '''
+import json, sys, timeit
+sys.path.insert(0, %(path)r)
+start = timeit.default_timer()
+import %(module)s
+elapsed = timeit.default_timer() - start
+print json.dumps([elapsed, sorted(m for m in %(heavy)r if m in sys.modules)])
+'''
+
+def time_import(path, module, repeats=5):
+    """
+    @param path The directory to import module from
+    @param module The name of the module
+    @return A tuple (times, heavy): the import time in seconds of every run,
+      or None if the import failed, and the heavy modules it loaded
+    """
+    code = _CHILD % {'path': os.path.join(ROOT, path), 'module': module, 'heavy': HEAVY}
+    times = []
+    heavy = []
+    for _ in xrange(repeats):
+        proc = subprocess.Popen([sys.executable, '-c', code],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        out, err = proc.communicate()
+        if proc.returncode != 0:
+            return None, err.strip().splitlines()[-1:]
+        elapsed, heavy = json.loads(out.strip().splitlines()[-1])
+        times.append(elapsed)
+    return times, heavy
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Benchmark module import times")
+    parser.add_argument("--repeats", type=int, default=5,
+                        help="The number of fresh interpreters to time each import in")
+    parser.add_argument("--fail-on-heavy", action="store_true",
+                        help="Exit with an error if any module loads a plotting dependency")
+    args = parser.parse_args()
+
+    print '%-60s %10s %10s  %s' % ('module', 'median ms', 'max ms', 'heavy imports')
+    num_heavy = 0
+    num_failed = 0
+    for path, module in MODULES:
+        times, heavy = time_import(path, module, args.repeats)
+        name = '%s:%s' % (path, module)
+        if times is None:
+            print '%-60s %10s %10s  %s' % (name, 'failed', '', ' '.join(heavy))
+            num_failed += 1
+            continue
+        times = sorted(times)
+        print '%-60s %10.1f %10.1f  %s' % (name, 1000.*times[len(times)//2],
+                                          1000.*times[-1], ' '.join(heavy))
+        if heavy:
+            num_heavy += 1
+
+    exit(1 if num_failed or (args.fail_on_heavy and num_heavy) else 0)
@@ -1,27 +1,183 @@
 #!/usr/bin/env python
+"""
+Break a belief state, a YAML sequence of states, into one file per state.
+
+The belief is parsed as a stream of YAML events, so only one state is held
+in memory at a time, and each state is written back out from its events
+without building Python objects. With --npz the states are instead
+flattened into a single states matrix, saved with the name of every column,
+which pomcp.load_belief can read as the initial belief.
+
+Example:
+  ./break_belief.py --belief belief.yaml --outdir states --processes 4
+  ./break_belief.py --belief belief.yaml --outdir states --npz
+"""
 import os, yaml
+import numpy
+
+# The libyaml parser and emitter are much faster, use them when available
+try:
+    from yaml import CLoader as Loader, CDumper as Dumper
+except ImportError:
+    from yaml import Loader, Dumper
+
+_START_EVENTS = (yaml.SequenceStartEvent, yaml.MappingStartEvent)
+_END_EVENTS = (yaml.SequenceEndEvent, yaml.MappingEndEvent)
+_STREAM_EVENTS = (yaml.StreamStartEvent, yaml.StreamEndEvent,
+                  yaml.DocumentStartEvent, yaml.DocumentEndEvent)
+
+def iter_state_events(stream):
+    """
+    @param stream A file containing a YAML sequence of states
+    @return A generator of the list of YAML events of every state
+    """
+    depth = 0
+    state = []
+    for event in yaml.parse(stream, Loader=Loader):
+        if isinstance(event, _STREAM_EVENTS):
+            continue
+        if depth == 0:
+            if not isinstance(event, yaml.SequenceStartEvent):
+                raise ValueError('The belief must be a sequence of states')
+            depth = 1
+            continue
+        if depth == 1 and isinstance(event, yaml.SequenceEndEvent):
+            depth = 0
+            continue
+
+        # Marks are only needed for error messages and keep events from pickling
+        event.start_mark = event.end_mark = None
+        state.append(event)
+        if isinstance(event, _START_EVENTS):
+            depth += 1
+        elif isinstance(event, _END_EVENTS):
+            depth -= 1
+        if depth == 1:
+            yield state
+            state = []
+
+def state_text(events):
+    """
+    @param events The YAML events of a single state
+    @return The state as a YAML document
+    """
+    return yaml.emit([yaml.StreamStartEvent(), yaml.DocumentStartEvent()] + events +
+                     [yaml.DocumentEndEvent(), yaml.StreamEndEvent()],
+                     Dumper=Dumper)
+
+def state_values(events):
+    """
+    Flatten a state into named numbers. Mapping keys and sequence indices
+    are joined with '.' to name each value, ex: {pose: [1, 2]} gives
+    [('pose.0', 1.), ('pose.1', 2.)].
+    @param events The YAML events of a single state
+    @return A list of (field, value) pairs
+    """
+    values = []
+    stack = [] # the [name, is mapping, key, index] of every open collection
+    for event in events:
+        if isinstance(event, _END_EVENTS):
+            stack.pop()
+            continue
+        if isinstance(event, yaml.AliasEvent):
+            raise ValueError('Aliases are not supported: %s' % event.anchor)
+
+        if not stack:
+            name = ''
+        else:
+            parent = stack[-1]
+            if parent[1]:
+                if parent[2] is None:
+                    parent[2] = event.value
+                    continue
+                part, parent[2] = parent[2], None
+            else:
+                part = str(parent[3])
+                parent[3] += 1
+            name = parent[0] + '.' + part if parent[0] else part
+
+        if isinstance(event, yaml.ScalarEvent):
+            try:
+                values.append((name or 'value', float(event.value)))
+            except ValueError:
+                raise ValueError('Field %s is not a number: %s' % (name, event.value))
+        else:
+            stack.append([name, isinstance(event, yaml.MappingStartEvent), None, 0])
+    return values
+
+def _write_state(task):
+    """
+    @param task A tuple (outfile, events)
+    """
+    outfile, events = task
+    with open(outfile, 'w') as f:
+        f.write(state_text(events))
+    return outfile
+
+def break_belief(belief, outdir, processes=None):
+    """
+    Write every state of the belief to its own file in outdir
+    @param processes If greater than 1, write the states from this many processes
+    @return The number of states written
+    """
+    with open(belief, 'r') as f:
+        tasks = ((os.path.join(outdir, '%03d.state' % idx), events)
+                 for idx, events in enumerate(iter_state_events(f)))
+
+        if processes is not None and processes > 1:
+            import multiprocessing
+            pool = multiprocessing.Pool(processes)
+            num_states = sum(1 for _ in pool.imap(_write_state, tasks, chunksize=64))
+            pool.close()
+            pool.join()
+        else:
+            num_states = sum(1 for _ in map(_write_state, tasks))
+    return num_states
+
+def belief_to_npz(belief, outfile):
+    """
+    Save the belief as a (num_states x num_fields) matrix
+    @param outfile The .npz file to write, with the arrays states and fields
+    @return The number of states written
+    """
+    fields = None
+    rows = []
+    with open(belief, 'r') as f:
+        for idx, events in enumerate(iter_state_events(f)):
+            values = state_values(events)
+            names = [name for name, _ in values]
+            if fields is None:
+                fields = names
+            elif names != fields:
+                raise ValueError('State %d has fields %s, expected %s' % (idx, names, fields))
+            rows.append([value for _, value in values])
+
+    states = numpy.array(rows, dtype=float).reshape(len(rows), len(fields or []))
+    numpy.savez(outfile, states=states, fields=numpy.array(fields or [], dtype=str))
+    return len(rows)
 
 if __name__ == '__main__':
-    
+
     import argparse
     parser = argparse.ArgumentParser(description="Break a belief state up into a set of files representing each state")
     parser.add_argument("--belief", type=str, required=True,
                         help="The belief state to break");
     parser.add_argument("--outdir", type=str, required=True,
                         help="The directory to write out the states to")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="The number of processes to write states from")
+    parser.add_argument("--npz", action="store_true",
+                        help="Write every state to a single belief.npz file instead")
     args = parser.parse_args()
 
-    # Load the belief state
-    with open(args.belief, 'r') as f:
-        bst = yaml.load(f.read())
-
     # Create the directory if it doesn't exist
     if not os.path.exists(args.outdir):
         os.makedirs(args.outdir)
 
-    for idx in range(len(bst)):
-        outfile = os.path.join(args.outdir, '%03d.state' % idx)
-        with open(outfile, 'w') as f:
-            f.write(yaml.dump(bst[idx]))
-        print 'Write state %d to file %s' % (idx, outfile)
-        
+    if args.npz:
+        outfile = os.path.join(args.outdir, 'belief.npz')
+        num_states = belief_to_npz(args.belief, outfile)
+        print 'Wrote %d states to file %s' % (num_states, outfile)
+    else:
+        num_states = break_belief(args.belief, args.outdir, processes=args.processes)
+        print 'Wrote %d states to directory %s' % (num_states, args.outdir)
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 import numpy, random
-from sample_2d_actions import sample_random_trajectory
-from graph_tools import RenderNode, PathGraph
+from sample_2d_actions import sample_random_trajectories
+from graph_tools import RenderNode, ArrayPathGraph
 
 def distance_goal(path, goal_center, goal_radius):
     
@@ -10,103 +10,209 @@ def distance_goal(path, goal_center, goal_radius):
     
     return max(0, distance - goal_radius)
 
-def sample_noisy_paths(path, noise_samples, sigma):
-    # Generate a set of noisy samples of the path
-    path_samples = []
-    for idx in range(noise_samples.shape[0]):
-        new_path = [ path[0] ]
-        for pidx in range(1, len(path)):
-            pt = path[pidx]
-            nidx = pidx*2
-            new_node = RenderNode(pt.id,
-                                  pt.x + sigma * noise_samples[idx][nidx],
-                                  pt.y + sigma * noise_samples[idx][nidx + 1],
-                                  color = pt.color,
-                                  parent_id = pt.parent_id)
-            new_path.append(new_node)
-        path_samples.append(new_path)
-    return path_samples
-
-def run_cma(path, goal_center, goal_radius, num_iterations=10, debug=False):
-    
-    num_points_in_path = len(path)
-    num_samples = 10
-    sigma = 0.05
-    C = numpy.eye(num_points_in_path * 2.)
-    ccov = 0.5 #(2/n^2)
-    zero_mean = numpy.zeros(num_points_in_path * 2.)
-    mean_path = path
-
-    # Now compute weights
-    mu = num_samples/2.
-    w = numpy.log(mu + 0.5) - numpy.log(range(1, int(mu)+1))
-    w = w / sum(w)
-    mu_w = 1./ sum([w[idx]*w[idx] for idx in range(int(mu))])
-
-    node_id = len(mean_path)
-    for idx in range(num_iterations):
-        # Sample y_i
-        noise_vals = numpy.random.multivariate_normal(zero_mean, C, num_samples)
-
-        # Sample a set of x candidates
-        path_samples = sample_noisy_paths(mean_path, noise_vals, sigma)
-        
-        # Debug
-        if args.debug:
-            G = PathGraph()
+def goal_distances(points, goal_center, goal_radius):
+    """
+    Vectorized version of distance_goal
+    @param points An array of paths of shape (..., num_points, 2)
+    @return The distance from the end of every path to the goal region
+    """
+    distance = numpy.linalg.norm(points[..., -1, :] - numpy.asarray(goal_center), axis=-1)
+    return numpy.maximum(0., distance - goal_radius)
+
+def path_to_array(path):
+    """
+    @param path A list of RenderNode objects
+    @return A (num_points x 2) array of the node positions
+    """
+    return numpy.array([[n.x, n.y] for n in path])
+
+def array_to_path(points, start_id=0, color=(0., 0., 0.)):
+    """
+    @param points A (num_points x 2) array of positions
+    @param start_id The id of the first node, later nodes get consecutive ids
+    @return A list of RenderNode objects, each the child of the one before it
+    """
+    path = []
+    for idx, (x, y) in enumerate(points):
+        path.append(RenderNode(start_id + idx, x, y, color=color,
+                               parent_id=path[-1].id if path else None))
+    return path
+
+class BatchCMAES(object):
+
+    def __init__(self, means, sigma, num_samples=None):
+        """
+        CMA-ES with rank-one and rank-mu covariance updates and cumulative
+        step-size adaptation (Hansen, The CMA Evolution Strategy: A Tutorial)
+        run on many independent problems at once. Every quantity has a
+        leading problem axis, so a generation of all problems is a handful
+        of array operations.
+
+        @param means A (num_problems x dim) array of initial means
+        @param sigma The initial step size
+        @param num_samples The number of samples per generation, defaults to
+          4 + 3 ln(dim)
+        """
+        self.mean = numpy.array(means, dtype=float)
+        P, D = self.mean.shape
+        self.dim = D
+        self.num_samples = num_samples or 4 + int(3 * numpy.log(D))
+
+        # Recombination weights of the best mu samples
+        mu = self.num_samples // 2
+        w = numpy.log(mu + 0.5) - numpy.log(numpy.arange(1, mu + 1))
+        self.weights = w / w.sum()
+        self.mueff = 1. / numpy.sum(self.weights**2)
+
+        # Learning rates
+        mueff = self.mueff
+        self.cc = (4. + mueff / D) / (D + 4. + 2. * mueff / D)
+        self.cs = (mueff + 2.) / (D + mueff + 5.)
+        self.c1 = 2. / ((D + 1.3)**2 + mueff)
+        self.cmu = min(1. - self.c1, 2. * (mueff - 2. + 1. / mueff) / ((D + 2.)**2 + mueff))
+        self.damps = 1. + 2. * max(0., numpy.sqrt((mueff - 1.) / (D + 1.)) - 1.) + self.cs
+        self.chiN = numpy.sqrt(D) * (1. - 1. / (4. * D) + 1. / (21. * D**2))
+
+        self.sigma = numpy.full(P, float(sigma))
+        self.C = numpy.tile(numpy.eye(D), (P, 1, 1))
+        self.B = numpy.tile(numpy.eye(D), (P, 1, 1))
+        self.eigvals = numpy.ones((P, D))
+        self.pc = numpy.zeros((P, D))
+        self.ps = numpy.zeros((P, D))
+        self.generation = 0
+
+    def ask(self):
+        """
+        @return A (num_problems x num_samples x dim) array of candidates
+        """
+        P, D = self.mean.shape
+        z = numpy.random.standard_normal((P, self.num_samples, D))
+        # y = B diag(sqrt(eigvals)) z
+        self._y = numpy.einsum('pij,psj->psi', self.B, z * numpy.sqrt(self.eigvals)[:, None, :])
+        return self.mean[:, None, :] + self.sigma[:, None, None] * self._y
+
+    def tell(self, fitness, active=None):
+        """
+        Update the distributions from the fitness of the last candidates
+        @param fitness A (num_problems x num_samples) array, lower is better
+        @param active A boolean array of the problems to update, defaults to all
+        """
+        P, D = self.mean.shape
+        if active is None:
+            active = numpy.ones(P, dtype=bool)
+        mu = len(self.weights)
+        self.generation += 1
+
+        # Weighted recombination of the best mu samples
+        order = numpy.argsort(fitness, axis=1)[:, :mu]
+        y = self._y[numpy.arange(P)[:, None], order]
+        yw = numpy.einsum('i,pid->pd', self.weights, y)
+
+        # C^(-1/2) yw = B diag(1/sqrt(eigvals)) B^T yw
+        invsqrt_yw = numpy.einsum('pij,pj->pi', self.B,
+                                  numpy.einsum('pji,pj->pi', self.B, yw) / numpy.sqrt(self.eigvals))
+        ps = (1. - self.cs) * self.ps + numpy.sqrt(self.cs * (2. - self.cs) * self.mueff) * invsqrt_yw
+        ps_norm = numpy.linalg.norm(ps, axis=1)
+        hsig = (ps_norm / numpy.sqrt(1. - (1. - self.cs)**(2 * self.generation)) / self.chiN
+                < 1.4 + 2. / (D + 1.)).astype(float)
+        pc = (1. - self.cc) * self.pc + \
+            (hsig * numpy.sqrt(self.cc * (2. - self.cc) * self.mueff))[:, None] * yw
+
+        # Rank-one and rank-mu updates
+        rank_one = numpy.einsum('pi,pj->pij', pc, pc) + \
+            ((1. - hsig) * self.cc * (2. - self.cc))[:, None, None] * self.C
+        rank_mu = numpy.einsum('k,pki,pkj->pij', self.weights, y, y)
+        C = (1. - self.c1 - self.cmu) * self.C + self.c1 * rank_one + self.cmu * rank_mu
+        C = 0.5 * (C + C.transpose(0, 2, 1))
+
+        sigma = self.sigma * numpy.exp((self.cs / self.damps) * (ps_norm / self.chiN - 1.))
+
+        self.mean[active] += self.sigma[active, None] * yw[active]
+        self.ps[active] = ps[active]
+        self.pc[active] = pc[active]
+        self.C[active] = C[active]
+        self.sigma[active] = sigma[active]
+
+        # Decompose every covariance in one batched call
+        eigvals, self.B = numpy.linalg.eigh(self.C)
+        self.eigvals = numpy.maximum(eigvals, 1e-20)
+
+def optimize_paths(paths, goal_center, goal_radius, num_iterations=10, sigma=0.05,
+                   num_samples=None, fitness=None, done=None, callback=None):
+    """
+    Move the waypoints of many paths toward the goal at once, each with its
+    own CMA-ES. The first point of every path stays fixed.
+
+    @param paths A (num_paths x num_points x 2) array of paths
+    @param fitness A function mapping an array of paths of shape
+      (..., num_points, 2) to their costs, defaults to goal_distances
+    @param done A function mapping an array of paths to true for the paths
+      that need no more optimization. Defaults to reaching the goal region
+      with the default fitness, otherwise every path runs every iteration.
+    @param callback If not None, called after every iteration with the
+      iteration, the mean paths and the sampled paths
+    @return The optimized (num_paths x num_points x 2) array of paths
+    """
+    if fitness is None:
+        fitness = lambda points: goal_distances(points, goal_center, goal_radius)
+        if done is None:
+            done = lambda points: fitness(points) <= 0.
+    if done is None:
+        done = lambda points: numpy.zeros(points.shape[:-2], dtype=bool)
+
+    paths = numpy.array(paths, dtype=float)
+    P, N, _ = paths.shape
+    start = paths[:, :1, :]
+    cma = BatchCMAES(paths[:, 1:, :].reshape(P, -1), sigma, num_samples=num_samples)
+
+    def to_paths(x):
+        shape = x.shape[:-1]
+        points = x.reshape(shape + (N - 1, 2))
+        starts = numpy.broadcast_to(start.reshape((P,) + (1,) * (len(shape) - 1) + (1, 2)),
+                                    shape + (1, 2))
+        return numpy.concatenate([starts, points], axis=-2)
+
+    active = ~done(to_paths(cma.mean))
+    for idx in xrange(num_iterations):
+        if not numpy.any(active):
+            break
+        samples = to_paths(cma.ask())
+        cma.tell(fitness(samples), active=active)
+        if callback is not None:
+            callback(idx, to_paths(cma.mean), samples)
+        active &= ~done(to_paths(cma.mean))
+
+    return to_paths(cma.mean)
+
+def run_cma(path, goal_center, goal_radius, num_iterations=10, debug=False,
+            savefile=None, edge_color=(0., 0., 0.), node_size=3.):
+    """
+    Optimize a single path of RenderNode objects
+    @param debug If true, render the samples and mean path after every iteration
+    @param savefile The file the debug rendering is saved to
+    @return The optimized path, the path itself if it has no point to move
+    """
+    if len(path) < 2:
+        return path
+
+    callback = None
+    if debug:
+        def callback(idx, mean_paths, samples):
+            G = ArrayPathGraph()
             G.set_goal_region(goal_center, radius=goal_radius)
-            G.add_path(mean_path, bold=True)
-            for p in path_samples:
-                for idx in range(1, len(p)):
-                    p[idx].id = node_id
-                    node_id += 1
-                    p[idx].parent_id = p[idx-1].id
-                G.add_path(p)
-
-        # Evaluate each
-        dists = [distance_goal(p, goal_center, goal_radius) for p in path_samples]
-        dists = zip(range(len(dists)), dists)
-
-        # Now sort in order of increasing f value
-        dists = sorted(dists, key=lambda k: k[1])
-
-        # Now move the mean
-        kept_idx = [ d[0] for d in dists[:len(w)] ]
-        yw = numpy.array([w[idx]*noise_vals[kept_idx[idx],:] for idx in range(len(w))])
-        yw = numpy.sum(yw, axis=0)
-
-        # Now update the mean
-        path_vals = []
-        for n in mean_path:
-            path_vals = path_vals + [n.x, n.y] 
-        path_vals = numpy.array(path_vals) + sigma*yw
-
-        new_mean_path = [ mean_path[0] ] # same start node
-        for idx in range(1, len(mean_path)):
-            new_node = RenderNode(node_id,
-                                  path_vals[idx*2],
-                                  path_vals[idx*2+1],
-                                  color = (0., 0., 0.5),
-                                  parent_id = new_mean_path[-1].id)
-            new_mean_path.append(new_node)
-            node_id += 1
-
-        if args.debug:
-            G.add_path(new_mean_path, weight=2)
+            G.add_path(path, bold=True)
+            G.add_paths(samples[0])
+            G.add_paths(mean_paths[:1], color=(0., 0., 0.5), weight=2)
             G.render(edge_color=edge_color,
                      node_size=node_size,
-                     savefile=args.savefile,
+                     savefile=savefile,
                      savefile_size=(2., 2.))
 
-        mean_path = new_mean_path
-        if distance_goal(mean_path, goal_center, goal_radius) == 0.0:
-            break
-
-        yw_tmp = numpy.array([yw])
-        yyt = numpy.dot(yw_tmp.T, yw_tmp)
-        #C = (1. - ccov) * C + ccov * mu_w * yyt
-    
-    return mean_path
+    points = optimize_paths(path_to_array(path)[None], goal_center, goal_radius,
+                            num_iterations=num_iterations, callback=callback)[0]
+    new_path = [ path[0] ] + array_to_path(points[1:], start_id=len(path), color=(0., 0., 0.5))
+    new_path[1].parent_id = path[0].id
+    return new_path
 
 if __name__ == '__main__':
     
@@ -137,29 +243,33 @@ if __name__ == '__main__':
     node_size = 3.
 
     start_pose = numpy.array([0., 0.])
-    start_node = RenderNode(0, 0., 0., color = node_color)
     
     goal_center = [0.5, 0.]
     goal_radius = 0.1
 
     # Generate the random paths
-    G = PathGraph()
+    G = ArrayPathGraph()
     G.set_goal_region(goal_center, radius=goal_radius)
+    start_idx = G.add_node(start_pose[0], start_pose[1], color=node_color)
 
-    node_id = 1
-    path_samples = []
-    for pidx in range(num_sampled_paths):
-        path = sample_random_trajectory(start_node, num_actions, bounds, node_color = node_color)
+    paths = sample_random_trajectories(num_sampled_paths, num_actions, bounds)
 
-        # Now run CMA
-        path = run_cma(path, goal_center, goal_radius, num_iterations=args.iterations, debug=args.debug)
+    # Now run CMA on every path at once
+    callback = None
+    if args.debug:
+        def callback(idx, mean_paths, samples):
+            D = ArrayPathGraph()
+            D.set_goal_region(goal_center, radius=goal_radius)
+            D.add_paths(mean_paths, weight=2)
+            D.render(edge_color=edge_color,
+                     node_size=node_size,
+                     savefile=args.savefile,
+                     savefile_size=(2., 2.))
+    paths = optimize_paths(paths, goal_center, goal_radius,
+                           num_iterations=args.iterations, callback=callback)
 
-        for idx in range(1, len(path)):
-            path[idx].id = node_id
-            node_id += 1
-            path[idx].parent_id = path[idx-1].id
-            
-        G.add_path(path)
+    # Every path shares the start node
+    G.add_paths(paths[:, 1:], parent=start_idx, color=node_color)
 
     # Now plot
     G.render(edge_color=edge_color,
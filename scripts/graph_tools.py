@@ -1,7 +1,7 @@
 #!/usr/bin/env python
-import networkx as nx
-import matplotlib.pyplot as plt
-from ss_plotting import plot_utils
+import numpy
+# networkx, matplotlib and ss_plotting are imported by the methods that use
+# them, so scripts that only build paths do not pay for them
 
 class RenderNode(object):
     
@@ -23,15 +23,10 @@ class RenderNode(object):
     def __str__(self):
         return '{%d: (%0.2f, %0.2f) -> %d' % (self.id, self.x, self.y, self.parent_id if self.parent_id is not None else -1)
 
-class PathGraph(object):
-
-    def __init__(self):
-        self.G = nx.DiGraph()
-        self.node_list = {}
-        self.goal_region = None
-
-    def clear_nodes(self):
-        self.node_list = {}
+class _GoalGraph(object):
+    """
+    The goal region and edge colors shared by the path graphs
+    """
 
     def set_goal_region(self, center, radius=0.1):
         """
@@ -49,6 +44,17 @@ class PathGraph(object):
         else:
             return default
 
+class PathGraph(_GoalGraph):
+
+    def __init__(self):
+        import networkx as nx
+        self.G = nx.DiGraph()
+        self.node_list = {}
+        self.goal_region = None
+
+    def clear_nodes(self):
+        self.node_list = {}
+
     def add_path(self, path, bold=False, weight=1):
         """
         @param A list of RenderNode objects that defines a path
@@ -70,79 +76,245 @@ class PathGraph(object):
         @param savefile_size The size of the output image
         @param show_plot If true, show the plot via plt.show()
         """
-        pos = nx.spring_layout(self.G)
         goal_region = self.goal_region
-        node_colors = []
-        node_list = []
-        edge_list = []
-        edge_colors = []
-        for rnode in self.node_list.values():
-            key = rnode.id
-            pos[key][0] = rnode.x
-            pos[key][1] = rnode.y
-            
-            node_colors.append(rnode.color)
-            node_list.append(key)
-
-        # Add the edges
-        edge_list = self.G.edges()
+
+        # Positions come straight from the nodes
+        node_ids = list(self.node_list.keys())
+        index = {key: idx for idx, key in enumerate(node_ids)}
+        pos = numpy.array([[self.node_list[key].x, self.node_list[key].y] for key in node_ids]).reshape(-1, 2)
+        node_colors = [self.node_list[key].color for key in node_ids]
+
+        # Add the edges between nodes with known positions
+        edge_list = [(u, v) for u, v in self.G.edges() if u in index and v in index]
         edge_colors = [self.get_edge_color(self.G[u][v]['weight'], default=edge_color) for u,v in edge_list]
         edge_weights = [self.G[u][v]['weight'] for u,v in edge_list]
+        segments = numpy.array([[pos[index[u]], pos[index[v]]] for u, v in edge_list]).reshape(-1, 2, 2)
 
-        padding = 0.05
-        xvals = [n.x for n in self.node_list.values()]
-        yvals = [n.y for n in self.node_list.values()]
-        if goal_region is not None:
-            xvals += [goal_region['center'][0] - goal_region['radius'],
-                      goal_region['center'][0] + goal_region['radius']]
-            yvals += [goal_region['center'][1] - goal_region['radius'],
-                      goal_region['center'][1] + goal_region['radius']]
-
-        axis_bounds = [min(xvals) - padding,
-                       max(xvals) + padding,
-                       min(yvals) - padding,
-                       max(yvals) + padding]
-
-        fig, ax = plt.subplots()
-        
-        # Setup the axis limits - turn off ticks
-        dx = goal_region['center'][0]+goal_region['radius'] + padding
-        axis_bounds = ([-padding, dx, -0.5*dx, 0.5*dx])
-        ax.set_xlim(axis_bounds[:2])
-        ax.set_ylim(axis_bounds[2:])
-        ax.set_xticks([])
-        ax.set_yticks([])
-        
-        # Draw the graph
-        nx.draw_networkx_nodes(self.G,
-                               pos, ax=ax,
-                               with_labels=False,
-                               nodelist = node_list,
-                               node_color = node_colors,
-                               node_size = node_size)
-
-        nx.draw_networkx_edges(self.G,
-                               pos,
-                               ax = ax,
-                               edgelist = edge_list,
-                               edge_color = edge_colors,
-                               width = edge_weights, 
-                               arrows = False)
+        _render(pos, node_colors, segments, edge_colors, edge_weights, goal_region,
+                node_size=node_size, goal_color=goal_color, savefile=savefile,
+                savefile_size=savefile_size, show_plot=show_plot)
+
+class ArrayPathGraph(_GoalGraph):
+
+    def __init__(self, capacity=1024):
+        """
+        A path graph that stores its nodes in growable numpy arrays instead
+        of a networkx graph and RenderNode objects. Every node has a single
+        parent, so the edges are stored as the parent index and weight of
+        each node. Use to_networkx for a networkx graph of the nodes.
+
+        @param capacity The number of nodes to allocate space for
+        """
+        self.size = 0
+        self.next_id = 0
+        self.ids = numpy.zeros(capacity, dtype=numpy.int64)
+        self.xy = numpy.zeros((capacity, 2))
+        self.colors = numpy.zeros((capacity, 3))
+        self.parents = numpy.full(capacity, -1, dtype=numpy.int64)
+        self.weights = numpy.ones(capacity, dtype=numpy.int64)
+        self.goal_region = None
+        self._index = {}
+        self._num_indexed = 0
+
+    def __len__(self):
+        return self.size
+
+    def clear_nodes(self):
+        self.size = 0
+        self.next_id = 0
+        self._index = {}
+        self._num_indexed = 0
+
+    def _node_index(self):
+        """
+        Nodes added in bulk are only added to the id lookup table once it is needed
+        @return A dictionary mapping the id of every node to its index
+        """
+        if self._num_indexed < self.size:
+            self._index.update(zip(self.ids[self._num_indexed:self.size].tolist(),
+                                   xrange(self._num_indexed, self.size)))
+            self._num_indexed = self.size
+        return self._index
+
+    def _reserve(self, num_nodes):
+        """
+        Grow the arrays to hold num_nodes more nodes
+        """
+        needed = self.size + num_nodes
+        if needed <= len(self.ids):
+            return
+        capacity = max(needed, 2*len(self.ids))
+        for name, fill in [('ids', 0), ('xy', 0.), ('colors', 0.), ('parents', -1), ('weights', 1)]:
+            old = getattr(self, name)
+            new = numpy.full((capacity,) + old.shape[1:], fill, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def add_node(self, x, y, color=(0., 0., 0.), parent=None, weight=1, node_id=None):
+        """
+        @param parent The index of the parent node, None if this is a root node
+        @param node_id The unique id of the node, defaults to one more than
+          the largest id in the graph
+        @return The index of the new node
+        """
+        if node_id is None:
+            node_id = self.next_id
+        elif node_id in self._node_index():
+            raise ValueError('Duplicate node id: %d' % node_id)
+
+        self._reserve(1)
+        idx = self.size
+        self.ids[idx] = node_id
+        self.xy[idx] = (x, y)
+        self.colors[idx] = color
+        self.parents[idx] = -1 if parent is None else parent
+        self.weights[idx] = weight
+        self.next_id = max(self.next_id, node_id + 1)
+        self.size += 1
+        return idx
+
+    def add_paths(self, points, parent=None, color=(0., 0., 0.), weight=1):
+        """
+        Add many paths at once
+        @param points A (num_paths x num_points x 2) array of paths
+        @param parent The index of a node every path starts from, None if
+          the first point of every path is a root node
+        @return A (num_paths x num_points) array of the indices of the new
+          nodes, they are given consecutive ids above the largest id in the graph
+        """
+        points = numpy.asarray(points, dtype=float)
+        num_paths, num_points = points.shape[:2]
+        num_nodes = num_paths * num_points
+        self._reserve(num_nodes)
+
+        indices = self.size + numpy.arange(num_nodes).reshape(num_paths, num_points)
+        nodes = indices.ravel()
+        self.ids[nodes] = self.next_id + numpy.arange(num_nodes)
+        self.next_id += num_nodes
+        self.xy[nodes] = points.reshape(-1, 2)
+        self.colors[nodes] = color
+        self.weights[nodes] = weight
+        parents = numpy.empty((num_paths, num_points), dtype=numpy.int64)
+        parents[:, 0] = -1 if parent is None else parent
+        parents[:, 1:] = indices[:, :-1]
+        self.parents[nodes] = parents.ravel()
+        self.size += num_nodes
+        return indices
+
+    def add_path(self, path, bold=False, weight=1):
+        """
+        @param A list of RenderNode objects that defines a path, parent ids
+          refer to nodes earlier in the path or already in the graph
+        """
+        index = self._node_index()
+        for rnode in path:
+            parent = None
+            if rnode.parent_id is not None:
+                if rnode.parent_id not in index:
+                    raise ValueError('Unknown parent id: %d' % rnode.parent_id)
+                parent = index[rnode.parent_id]
+            if rnode.id in index:
+                idx = index[rnode.id]
+                self.xy[idx] = (rnode.x, rnode.y)
+                self.colors[idx] = rnode.color
+                if parent is not None:
+                    self.parents[idx] = parent
+                    self.weights[idx] = 3 if bold else weight
+                continue
+            index[rnode.id] = self.add_node(rnode.x, rnode.y, color=rnode.color, parent=parent,
+                                            weight=3 if bold else weight, node_id=rnode.id)
+            self._num_indexed = self.size
+
+    def to_networkx(self):
+        """
+        @return A networkx DiGraph with a node per id, holding its x, y and
+          color, and an edge from every parent with its weight
+        """
+        import networkx as nx
+        G = nx.DiGraph()
+        for idx in xrange(self.size):
+            G.add_node(self.ids[idx], x=self.xy[idx, 0], y=self.xy[idx, 1],
+                       color=tuple(self.colors[idx]))
+        children = numpy.flatnonzero(self.parents[:self.size] >= 0)
+        for idx in children:
+            G.add_edge(self.ids[self.parents[idx]], self.ids[idx], weight=self.weights[idx])
+        return G
+
+    def render(self, edge_color=(0., 0., 0.), node_size=50., goal_color=(.4, .4, .4), padding=0.05, savefile=None, savefile_size=(2., 2.), show_plot=True):
+        """
+        Render the graph, see PathGraph.render
+        """
+        pos = self.xy[:self.size]
+        children = numpy.flatnonzero(self.parents[:self.size] >= 0)
+        segments = numpy.stack([pos[self.parents[children]], pos[children]], axis=1)
+        edge_weights = self.weights[children]
+        edge_colors = [self.get_edge_color(w, default=edge_color) for w in edge_weights]
+
+        _render(pos, self.colors[:self.size], segments, edge_colors, edge_weights,
+                self.goal_region, node_size=node_size, goal_color=goal_color,
+                savefile=savefile, savefile_size=savefile_size, show_plot=show_plot)
+
+def _render(pos, node_colors, segments, edge_colors, edge_weights, goal_region,
+            node_size=50., goal_color=(.4, .4, .4), savefile=None, savefile_size=(2., 2.),
+            show_plot=True):
+    """
+    Draw nodes and edges given as arrays
+    @param pos A (num_nodes x 2) array of node positions
+    @param segments A (num_edges x 2 x 2) array of edge end points
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.collections import LineCollection
+    from ss_plotting import plot_utils
+
+    padding = 0.05
+    xvals = list(pos[:, 0])
+    yvals = list(pos[:, 1])
+    if goal_region is not None:
+        xvals += [goal_region['center'][0] - goal_region['radius'],
+                  goal_region['center'][0] + goal_region['radius']]
+        yvals += [goal_region['center'][1] - goal_region['radius'],
+                  goal_region['center'][1] + goal_region['radius']]
+
+    axis_bounds = [min(xvals) - padding,
+                   max(xvals) + padding,
+                   min(yvals) - padding,
+                   max(yvals) + padding]
+
+    fig, ax = plt.subplots()
+    
+    # Setup the axis limits - turn off ticks
+    dx = goal_region['center'][0]+goal_region['radius'] + padding
+    axis_bounds = ([-padding, dx, -0.5*dx, 0.5*dx])
+    ax.set_xlim(axis_bounds[:2])
+    ax.set_ylim(axis_bounds[2:])
+    ax.set_xticks([])
+    ax.set_yticks([])
+    
+    # Draw the graph, all edges as one collection and all nodes as one scatter
+    ax.add_collection(LineCollection(segments,
+                                     colors = edge_colors,
+                                     linewidths = edge_weights,
+                                     zorder = 1))
+    if len(pos) > 0:
+        ax.scatter(pos[:, 0], pos[:, 1],
+                   s = node_size,
+                   c = node_colors,
+                   zorder = 2)
+
+    # Draw teh goal region
+    if goal_region is not None:
+        gregion = plt.Circle(goal_region['center'],
+                             goal_region['radius'],
+                             linestyle='dashed',
+                             color=goal_color, fill=False)
+        ax.add_artist(gregion)
+
+    # Turn on plotting of all 4 axis 
+    if savefile is not None or show_plot:
+        plot_utils.simplify_axis(ax, xtop=True, yright=True)
         
-        # Draw teh goal region
-        if goal_region is not None:
-            gregion = plt.Circle(goal_region['center'],
-                                 goal_region['radius'],
-                                 linestyle='dashed',
-                                 color=goal_color, fill=False)
-            ax.add_artist(gregion)
-
-        # Turn on plotting of all 4 axis 
-        if savefile is not None or show_plot:
-            plot_utils.simplify_axis(ax, xtop=True, yright=True)
-            
-        if savefile is not None:
-            plot_utils.output(fig, savefile, savefile_size)
-
-        if show_plot:
-            plt.show()
+    if savefile is not None:
+        plot_utils.output(fig, savefile, savefile_size)
+
+    if show_plot:
+        plt.show()
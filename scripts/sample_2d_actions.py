@@ -1,6 +1,6 @@
 #!/usr/bin/env python
 import numpy, random
-from graph_tools import RenderNode, PathGraph
+from graph_tools import RenderNode, ArrayPathGraph
 
 def sample_random_trajectory(start_node, num_actions, bounds, node_color=(0., 0., 0.)):
     """
@@ -27,6 +27,44 @@ def sample_random_trajectory(start_node, num_actions, bounds, node_color=(0., 0.
         path.append(new_node)
     return path
 
+def sample_random_trajectories(num_trajectories, num_actions, bounds, start=(0., 0.),
+                               rng=None, outfile=None, dtype=numpy.float64,
+                               chunk_size=100000):
+    """
+    Vectorized version of sample_random_trajectory
+    @param num_trajectories The number of trajectories to sample
+    @param num_actions The number of actions to sample in every trajectory
+    @param bounds A 3x2 matrix describing upper and lower bounds for dx, dy, dt
+    @param start The (x, y) start position of every trajectory
+    @param rng A numpy.random.RandomState or a seed, defaults to a fresh generator
+    @param outfile If not None, the samples are written to a memory mapped
+      .npy file at this path instead of held in memory
+    @param chunk_size The number of trajectories sampled at once
+    @return A (num_trajectories x num_actions+1 x 2) array with the positions
+      of every trajectory, starting with the start position
+    """
+    if not isinstance(rng, numpy.random.RandomState):
+        rng = numpy.random.RandomState(rng)
+    bounds = numpy.asarray(bounds, dtype=float)
+    shape = (num_trajectories, num_actions + 1, 2)
+
+    if outfile is not None:
+        points = numpy.lib.format.open_memmap(outfile, mode='w+', dtype=dtype, shape=shape)
+    else:
+        points = numpy.empty(shape, dtype=dtype)
+
+    for begin in xrange(0, num_trajectories, chunk_size):
+        end = min(begin + chunk_size, num_trajectories)
+        # Every action is (dx, dy, dt) and moves the pose by (dx*dt, dy*dt)
+        actions = rng.uniform(bounds[:, 0], bounds[:, 1], size=(end - begin, num_actions, 3))
+        points[begin:end, 0] = start
+        points[begin:end, 1:] = numpy.asarray(start) + \
+            numpy.cumsum(actions[..., :2] * actions[..., 2:], axis=1)
+
+    if outfile is not None:
+        points.flush()
+    return points
+
 if __name__=='__main__':
     import argparse
     
@@ -37,6 +75,12 @@ if __name__=='__main__':
                         help="The number of paths to sample")
     parser.add_argument("--num-actions", type=int, default=5,
                         help="The number of actions to sample per path")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="The seed of the random generator")
+    parser.add_argument("--outfile", type=str, default=None,
+                        help="A .npy file to write the sampled trajectories to")
+    parser.add_argument("--max-render", type=int, default=1000,
+                        help="The largest number of sampled paths to plot")
     args = parser.parse_args()
 
     dx_range = [0.0, 0.5]
@@ -52,20 +96,15 @@ if __name__=='__main__':
     node_size = 3.
 
     start_pose = numpy.array([0., 0.])
-    start_node = RenderNode(0, 0., 0., color = node_color)
 
     # Generate the random paths
-    G = PathGraph()
+    G = ArrayPathGraph()
     G.set_goal_region((.5, 0.), radius=0.1)
-    node_id = 1
-    for pidx in range(num_sampled_paths):
-        path = sample_random_trajectory(start_node, num_actions, bounds)
-        for idx in range(1, len(path)):
-            path[idx].id = node_id
-            node_id += 1
-            path[idx].parent_id = path[idx-1].id
-        G.add_path(path)
-
+    start_idx = G.add_node(start_pose[0], start_pose[1], color=node_color)
+    points = sample_random_trajectories(num_sampled_paths, num_actions, bounds,
+                                        start=start_pose, rng=args.seed,
+                                        outfile=args.outfile)
+    G.add_paths(points[:args.max_render, 1:], parent=start_idx, color=node_color)
 
     # Now plot
     G.render(edge_color=edge_color,
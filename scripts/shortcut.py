@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+"""
+Shortcut paths by dropping intermediate points. A shortcut of a path is
+described by a boolean mask over its points that always keeps both
+endpoints. Every path gets a batch of random candidate masks, each is
+scored by a cost function and an optional validity check, and the cheapest
+valid candidate is kept. The unmodified path is always a candidate, so a
+shortcut is never worse than the original.
+
+Cost and validity functions take the points of a batch of paths
+(num_paths x num_points x 2) and their masks (num_paths x num_points) and
+return one value per path. They must be picklable (module level functions
+or instances of module level classes) to be used with a process pool.
+
+Example:
+  ./shortcut.py --num-paths 10000 --num-candidates 200 --processes 4
+"""
+import logging, timeit
+import numpy
+
+logger = logging.getLogger(__name__)
+
+def kept_segments(points, mask):
+    """
+    @param points A (num_paths x num_points x 2) array of paths
+    @param mask A (num_paths x num_points) array, true for the points kept
+    @return A tuple (starts, ends, kept). starts and ends are
+      (num_paths x num_points-1 x 2) arrays holding the segment that ends at
+      every point after the first, starting from the last kept point before
+      it. kept is true for the segments that end at a kept point.
+    """
+    num_paths, num_points = mask.shape
+    idx = numpy.arange(num_points)
+    last = numpy.maximum.accumulate(numpy.where(mask, idx, 0), axis=1)
+    rows = numpy.arange(num_paths)[:, None]
+    starts = points[rows, last[:, :-1]]
+    return starts, points[:, 1:], mask[:, 1:]
+
+def path_length(points, mask):
+    """
+    @return The length of every shortcut path
+    """
+    starts, ends, kept = kept_segments(points, mask)
+    lengths = numpy.sqrt(((ends - starts)**2).sum(axis=-1))
+    return (lengths * kept).sum(axis=1)
+
+class CircleObstacles(object):
+
+    def __init__(self, centers, radii):
+        """
+        A validity check that rejects shortcuts passing through any of a set
+        of circular obstacles
+        @param centers A (num_obstacles x 2) array of obstacle centers
+        @param radii The radius of every obstacle
+        """
+        self.centers = numpy.asarray(centers, dtype=float).reshape(-1, 2)
+        self.radii = numpy.broadcast_to(numpy.asarray(radii, dtype=float),
+                                        (len(self.centers),)).copy()
+
+    def __call__(self, points, mask):
+        """
+        @return True for every shortcut path that is collision free
+        """
+        starts, ends, kept = kept_segments(points, mask)
+        starts = starts[:, :, None, :]
+        delta = (ends - starts[:, :, 0])[:, :, None, :]
+        offset = self.centers - starts
+        sqlen = (delta**2).sum(axis=-1)
+        t = numpy.clip((offset * delta).sum(axis=-1) / numpy.maximum(sqlen, 1e-12), 0., 1.)
+        dist = ((offset - t[..., None] * delta)**2).sum(axis=-1)
+        hits = (dist < self.radii**2).any(axis=-1) & kept
+        return ~hits.any(axis=1)
+
+def sample_shortcuts(num_paths, num_points, num_candidates, rng=None):
+    """
+    Sample random shortcuts: every candidate keeps a uniformly random
+    number of points, chosen uniformly at random, and both endpoints
+    @param rng A numpy RandomState or seed
+    @return A (num_paths x num_candidates x num_points) boolean mask
+    """
+    if not isinstance(rng, numpy.random.RandomState):
+        rng = numpy.random.RandomState(rng)
+
+    masks = numpy.ones((num_paths, num_candidates, num_points), dtype=bool)
+    num_interior = num_points - 2
+    if num_interior <= 0:
+        return masks
+
+    # The rank of independent random keys gives a random permutation of the
+    # interior points, keep the ones ranked below the number to keep
+    num_kept = rng.randint(0, num_interior + 1, size=(num_paths, num_candidates, 1))
+    keys = rng.random_sample((num_paths, num_candidates, num_interior))
+    ranks = keys.argsort(axis=-1).argsort(axis=-1)
+    masks[:, :, 1:-1] = ranks < num_kept
+    return masks
+
+def _shortcut_chunk(task):
+    """
+    Find the best shortcut of every path in a chunk
+    @param task A tuple (points, num_candidates, cost, is_valid, seed)
+    @return A tuple (masks, costs) with the best mask and its cost for every path
+    """
+    points, num_candidates, cost, is_valid, seed = task
+    num_paths, num_points = points.shape[:2]
+
+    masks = sample_shortcuts(num_paths, num_points, num_candidates, rng=seed)
+    masks[:, 0] = True
+
+    # Score every candidate as one flat batch
+    flat_points = numpy.repeat(points, num_candidates, axis=0)
+    flat_masks = masks.reshape(-1, num_points)
+    costs = numpy.asarray(cost(flat_points, flat_masks), dtype=float)
+    if is_valid is not None:
+        costs = numpy.where(is_valid(flat_points, flat_masks), costs, numpy.inf)
+    costs = costs.reshape(num_paths, num_candidates)
+
+    best = costs.argmin(axis=1)
+    rows = numpy.arange(num_paths)
+    return masks[rows, best], costs[rows, best]
+
+def shortcut_paths(paths, num_candidates=100, cost=path_length, is_valid=None,
+                   processes=None, seed=None, max_elements=10**7):
+    """
+    @param paths A (num_paths x num_points x 2) array of paths
+    @param num_candidates The number of shortcuts to score per path,
+      including the unmodified path
+    @param cost A function giving the cost of shortcut paths, lower is better
+    @param is_valid A function that is false for shortcut paths that cannot
+      be used, None if every shortcut is valid
+    @param processes If greater than 1, score the paths across this many processes
+    @param max_elements The largest number of (path, candidate, point)
+      entries scored at once by a process
+    @return A tuple (masks, costs): the mask of the points kept in the best
+      shortcut of every path and its cost. The cost is inf when no
+      candidate, including the original path, is valid.
+    """
+    paths = numpy.asarray(paths, dtype=float)
+    num_paths, num_points = paths.shape[:2]
+    rng = seed if isinstance(seed, numpy.random.RandomState) else numpy.random.RandomState(seed)
+
+    chunk_size = max(1, max_elements // (num_candidates * num_points))
+    tasks = [(paths[start:start + chunk_size], num_candidates, cost, is_valid,
+              rng.randint(2**31 - 1))
+             for start in xrange(0, num_paths, chunk_size)]
+
+    if processes is not None and processes > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(processes)
+        results = pool.map(_shortcut_chunk, tasks)
+        pool.close()
+        pool.join()
+    else:
+        results = map(_shortcut_chunk, tasks)
+
+    if not results:
+        return numpy.ones((0, num_points), dtype=bool), numpy.zeros(0)
+    masks, costs = zip(*results)
+    return numpy.concatenate(masks), numpy.concatenate(costs)
+
+def apply_shortcuts(paths, masks):
+    """
+    @return A list with the kept points of every path
+    """
+    return [points[mask] for points, mask in zip(paths, masks)]
+
+if __name__ == '__main__':
+
+    import argparse
+    from sample_2d_actions import sample_random_trajectories
+
+    parser = argparse.ArgumentParser(description="Shortcut randomly sampled paths")
+    parser.add_argument("--num-paths", type=int, default=1000,
+                        help="The number of paths to sample")
+    parser.add_argument("--num-actions", type=int, default=10,
+                        help="The number of actions to sample per path")
+    parser.add_argument("--num-candidates", type=int, default=100,
+                        help="The number of shortcuts to score per path")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="The number of processes to score shortcuts in")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="The seed of the random generator")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    bounds = numpy.array([[0.0, 0.5],
+                          [-0.5, 0.5],
+                          [0.1, 0.5]])
+    rng = numpy.random.RandomState(args.seed)
+    paths = sample_random_trajectories(args.num_paths, args.num_actions, bounds, rng=rng)
+
+    start = timeit.default_timer()
+    masks, costs = shortcut_paths(paths, num_candidates=args.num_candidates,
+                                  processes=args.processes, seed=rng)
+    elapsed = timeit.default_timer() - start
+
+    lengths = path_length(paths, numpy.ones(paths.shape[:2], dtype=bool))
+    logger.info('Shortcut %d paths in %0.2fs', len(paths), elapsed)
+    logger.info('Mean length %0.3f -> %0.3f, mean points kept %0.1f of %d',
+                lengths.mean(), costs.mean(), masks.sum(axis=1).mean(), paths.shape[1])